@@ -0,0 +1,202 @@
+import argparse
+import json
+import sys
+import time
+
+from biosim.core.simulation import Simulation
+from biosim.core.persistence import load_simulation, save_simulation
+from biosim.core.agent import BRAIN_CACHE
+from biosim.core.checkpoint import CheckpointLog
+from biosim.core.recorder import TrajectoryRecorder
+from biosim.core.profiler import ProfileWriter, profile_delta
+from biosim.core.stats import StatsWriter
+from biosim.core import sweep, bench
+
+def parse_values(value):
+    """
+    Sweep values: a JSON list as is ('[{"Kill": true}, {"Kill": false}]'),
+    any other JSON value alone, otherwise comma-separated scalars ("0.01,0.02").
+    """
+    try: parsed = json.loads(value)
+    except json.JSONDecodeError: return [json.loads(v) for v in value.split(",")]
+    return parsed if isinstance(parsed, list) else [parsed]
+
+def parse_params(items, multi=False):
+    """["mut=0.01", ...] -> {"mut": 0.01}; with multi, "mut=0.01,0.02" -> {"mut": [0.01, 0.02]} (see parse_values)."""
+    params = {}
+    for item in items or []:
+        key, _, value = item.partition("=")
+        params[key] = parse_values(value) if multi else json.loads(value)
+    return params
+
+def positive_int(text):
+    value = int(text)
+    if value <= 0: raise argparse.ArgumentTypeError(f"must be positive, got {value}")
+    return value
+
+def cmd_run(args):
+    res = load_simulation(args.level)
+    if not res: return 1
+    sim = Simulation(seed=args.seed, brain_cache=args.brain_cache)
+    print(f"Seed: {sim.seed_value}")
+    sim.load_state(*res)
+    sim.update_params(parse_params(args.param))
+    if args.pop is not None: sim.pop_size = args.pop
+    if args.steps is not None: sim.steps_per_gen = args.steps
+    if args.checkpoint:
+        # Every run starts its own log
+        sim.checkpoint_log, sim.checkpoint_every = CheckpointLog(args.checkpoint), args.every
+        sim.checkpoint_log.clear()
+    # A level file without a population (or a seeded run) starts fresh
+    if not sim.agents or args.seed is not None: sim.reset()
+    else: sim.checkpoint()
+    return run_and_report(sim, args)
+
+def cmd_replay(args):
+    log = CheckpointLog(args.log)
+    if not log.index:
+        print(f"No checkpoints in {args.log}")
+        return 1
+    sim = Simulation(brain_cache=args.brain_cache)
+    start = time.perf_counter()
+    if not log.restore(sim, args.to):
+        print(f"No checkpoint at or before generation {args.to} (have {log.generations()[0]}..{log.generations()[-1]})")
+        return 1
+    print(f"Restored generation {sim.generation} from checkpoint {log.nearest(args.to)} in {time.perf_counter() - start:.2f}s")
+    return run_and_report(sim, args)
+
+def run_and_report(sim, args):
+    if args.record: sim.recorder = TrajectoryRecorder(args.record)
+    sim.timer.enabled = bool(args.profile)
+    profile = ProfileWriter(args.profile, sim.timer) if args.profile else None
+    stats = StatsWriter(args.stats, sim.stats, args.stats_batch) if args.stats else None
+
+    def report(generation, survivors):
+        if profile: profile.write_generation(generation)
+        if stats: stats.update()
+        if args.quiet: return
+        rate = survivors / sim.pop_size if sim.pop_size else 0.0
+        print(f"Gen {generation}: {survivors} survivors ({rate:.1%})")
+
+    start = time.perf_counter()
+    sim.run(args.generations, callback=report)
+    elapsed = time.perf_counter() - start
+    if sim.recorder: sim.recorder.close()
+    if stats: stats.close()
+    print(f"Ran {args.generations} generations in {elapsed:.2f}s")
+    cache = BRAIN_CACHE.stats()
+    print(f"Brain cache: {cache['hits']} hits, {cache['misses']} misses ({cache['hit_rate']:.1%})")
+    if profile:
+        profile.close()
+        for phase, seconds, calls in profile_delta({}, sim.timer.snapshot()):
+            print(f"  {phase:<11}{seconds:8.2f}s {seconds * 1000 / calls:9.3f} ms/call ({seconds / elapsed:.1%})")
+
+    if args.save: save_simulation(args.save, sim.grid, sim.agents, sim.get_params())
+    return 0
+
+def cmd_sweep(args):
+    res = load_simulation(args.level)
+    if not res: return 1
+    grid, _, params = res
+    spec = {}
+    if args.grid:
+        with open(args.grid) as f: spec = json.load(f)
+    spec.update(parse_params(args.param, multi=True))
+    cells = sweep.expand_grid(spec)
+    for i, cell in enumerate(cells): print(f"Cell {i}: {cell}")
+
+    def progress(done, total, cell, repeat):
+        print(f"[{done}/{total}] cell {cell} repeat {repeat} done")
+
+    start = time.perf_counter()
+    sweep.run_sweep(grid, params, cells, args.generations, args.out, repeats=args.repeats, base_seed=args.seed,
+                    workers=args.workers, only=args.only, progress=progress, brain_cache=args.brain_cache)
+    print(f"Sweep finished in {time.perf_counter() - start:.2f}s, results in {args.out}")
+    return 0
+
+def cmd_bench(args):
+    benches = args.only.split(",") if args.only else bench.BENCHES
+    pops = [int(v) for v in args.pops.split(",")] if args.pops else ([1000] if args.quick else bench.POPS)
+    sizes = [int(v) for v in args.sizes.split(",")] if args.sizes else ([128] if args.quick else bench.SIZES)
+
+    def progress(r):
+        print(f"{r['bench']:<11} pop {r['pop']:>6} size {r['size']:>4}: {r['value']:10.2f} {r['unit']}")
+
+    results = bench.run_suite(benches, pops, sizes, repeats=1 if args.quick else args.repeats, progress=progress)
+    if args.out:
+        bench.save_results(args.out, results)
+        print(f"Results written to {args.out}")
+    if not args.baseline: return 0
+
+    rows = bench.compare(results, bench.load_results(args.baseline), args.tolerance)
+    print(f"\nAgainst {args.baseline} (tolerance {args.tolerance:.0%}):")
+    for (name, pop, size), base, new, slowdown, regressed in rows:
+        print(f"{name:<11} pop {pop:>6} size {size:>4}: {base:10.2f} -> {new:10.2f} {slowdown:+7.1%} time{'  REGRESSION' if regressed else ''}")
+    regressions = sum(row[4] for row in rows)
+    print(f"{regressions} regression(s) in {len(rows)} compared case(s)")
+    return 1 if regressions else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m biosim", description="BioSim-Py headless runner")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="Run a level without the GUI")
+    p_run.add_argument("level", help="Level or save file (JSON)")
+    p_run.add_argument("--generations", "-g", type=int, default=1)
+    p_run.add_argument("--pop", type=positive_int, default=None, help="Override population size")
+    p_run.add_argument("--steps", type=positive_int, default=None, help="Override steps per generation")
+    p_run.add_argument("--save", default=None, help="Save the final state to this file")
+    p_run.add_argument("--param", "-p", action="append", metavar="KEY=VALUE", help="Override a param, e.g. mut=0.02")
+    p_run.add_argument("--seed", type=int, default=None, help="Seed the RNGs and start a fresh population")
+    p_run.add_argument("--checkpoint", default=None, help="Append checkpoints to this log file")
+    p_run.add_argument("--every", type=int, default=10, help="Checkpoint every N generations")
+    p_run.add_argument("--record", default=None, help="Record per-step trajectories into this directory")
+    p_run.add_argument("--profile", default=None, help="Write per-generation phase timings to this CSV file")
+    p_run.add_argument("--stats", default=None, help="Stream per-generation population statistics to this CSV file")
+    p_run.add_argument("--stats-batch", type=int, default=100, help="Generations per --stats write")
+    p_run.add_argument("--brain-cache", type=positive_int, default=None, help="Max compiled brains kept in memory (default 4096, a few KB each)")
+    p_run.add_argument("--quiet", "-q", action="store_true")
+    p_run.set_defaults(func=cmd_run)
+
+    p_replay = sub.add_parser("replay", help="Jump to a generation of a checkpointed run")
+    p_replay.add_argument("log", help="Checkpoint log written by run --checkpoint")
+    p_replay.add_argument("--to", type=int, required=True, help="Generation to restore")
+    p_replay.add_argument("--generations", "-g", type=int, default=0, help="Generations to run after restoring")
+    p_replay.add_argument("--save", default=None, help="Save the state to this file")
+    p_replay.add_argument("--record", default=None, help="Record per-step trajectories into this directory")
+    p_replay.add_argument("--profile", default=None, help="Write per-generation phase timings to this CSV file")
+    p_replay.add_argument("--stats", default=None, help="Stream per-generation population statistics to this CSV file")
+    p_replay.add_argument("--stats-batch", type=int, default=100, help="Generations per --stats write")
+    p_replay.add_argument("--brain-cache", type=positive_int, default=None, help="Max compiled brains kept in memory (default 4096, a few KB each)")
+    p_replay.add_argument("--quiet", "-q", action="store_true")
+    p_replay.set_defaults(func=cmd_replay)
+
+    p_sweep = sub.add_parser("sweep", help="Run a parameter grid over a process pool")
+    p_sweep.add_argument("level", help="Level file (JSON)")
+    p_sweep.add_argument("--grid", default=None, help='JSON file of {"param": [values, ...]}')
+    p_sweep.add_argument("--param", "-p", action="append", metavar="KEY=V1,V2", help='Sweep a param, e.g. mut=0.001,0.01 or traits=\'[{"Kill": true}, {"Kill": false}]\'')
+    p_sweep.add_argument("--generations", "-g", type=int, default=10)
+    p_sweep.add_argument("--repeats", type=int, default=1, help="Runs per cell (different seeds)")
+    p_sweep.add_argument("--seed", type=int, default=0, help="Base seed")
+    p_sweep.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    p_sweep.add_argument("--only", type=int, default=None, help="Rerun a single cell")
+    p_sweep.add_argument("--brain-cache", type=positive_int, default=None, help="Max compiled brains kept in memory (default 4096, a few KB each)")
+    p_sweep.add_argument("--out", default="sweep_results.csv")
+    p_sweep.set_defaults(func=cmd_sweep)
+
+    p_bench = sub.add_parser("bench", help="Benchmark the core hot paths on synthetic levels")
+    p_bench.add_argument("--out", default=None, help="Write results to this JSON file")
+    p_bench.add_argument("--baseline", default=None, help="Compare against results from an earlier --out")
+    p_bench.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before a case counts as a regression")
+    p_bench.add_argument("--only", default=None, help=f"Comma-separated benchmarks ({','.join(bench.BENCHES)})")
+    p_bench.add_argument("--pops", default=None, help="Comma-separated populations (default 1000,5000,10000)")
+    p_bench.add_argument("--sizes", default=None, help="Comma-separated grid sizes (default 128,256,512)")
+    p_bench.add_argument("--repeats", type=int, default=3, help="Runs per case; the fastest counts")
+    p_bench.add_argument("--quick", action="store_true", help="One repeat at pop 1000, size 128")
+    p_bench.set_defaults(func=cmd_bench)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,53 @@
-import math
-import random
+from collections import OrderedDict
+import numpy as np
 from biosim.core.constants import *
-from biosim.core.genome import make_random_gene
+from biosim.core.genome import make_random_genes, unpack_fields
+
+class BrainCache:
+    """
+    Bounded LRU cache of compiled brains (connections, used sensors, color)
+    keyed by genome content. Shared by all agents across generations, so
+    converged populations skip almost all compilation. An entry takes a few
+    KB, so max_size bounds the memory (about 10 MB at the default).
+    """
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size: self.entries.popitem(last=False)
+
+    def resize(self, max_size):
+        """Changes the bound, dropping the least recently used entries beyond it."""
+        self.max_size = max_size
+        while len(self.entries) > max_size: self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries),
+                "hit_rate": self.hits / total if total else 0.0}
+
+BRAIN_CACHE = BrainCache()
 
 class Agent:
-    __slots__ = ('x', 'y', 'genome', 'connections', 'neurons', 'last_move', 'color', 'id', 'alive', 'kill_intent')
+    __slots__ = ('x', 'y', 'genome', 'connections', 'used_sensors', 'live_neurons', 'neurons', 'last_move', 'color', 'id', 'alive', 'kill_intent')
     def __init__(self, x, y, genome=None, genome_length=12, agent_id=0):
         self.x = x
         self.y = y
@@ -14,105 +57,56 @@ class Agent:
         self.kill_intent = 0.0 # Used for visual feedback and sensors
         
         if genome is None:
-            self.genome = [make_random_gene() for _ in range(genome_length)]
+            self.genome = make_random_genes(genome_length)
         else:
             self.genome = genome
-            
-        self.compile_brain()
-        self.update_color()
+
+        # Compiled brains are shared between agents with identical genomes
+        key = self.genome.tobytes()
+        cached = BRAIN_CACHE.get(key)
+        if cached:
+            self.connections, self.used_sensors, self.live_neurons, self.color = cached
+            self.neurons = [0.0] * MAX_NEURONS
+        else:
+            self.compile_brain()
+            self.update_color()
+            BRAIN_CACHE.put(key, (self.connections, self.used_sensors, self.live_neurons, self.color))
 
     def update_color(self):
-        h = abs(hash(str([(g.source_num, g.sink_num) for g in self.genome])))
+        src_t, src_num, sink_t, sink_num, weight = unpack_fields(self.genome)
+        h = abs(hash(str(list(zip(src_num.tolist(), sink_num.tolist())))))
         self.color = [h % 255, (h // 255) % 255, (h // 65025) % 255]
 
     def compile_brain(self):
-        self.connections = []
+        """
+        Compiles the genome into a pruned connection list:
+        parallel edges are merged by summing weights, and connections that
+        cannot influence any action are dropped (out of neurons that never
+        receive a signal, or into neurons that never reach an action).
+        """
         self.neurons = [0.0] * MAX_NEURONS
-        for g in self.genome:
-            src_t, sink_t = g.source_type, g.sink_type
-            src_id = g.source_num % (MAX_NEURONS if src_t == 0 else NUM_SENSORS)
-            sink_id = g.sink_num % (MAX_NEURONS if sink_t == 0 else NUM_ACTIONS)
-            self.connections.append((src_t, src_id, sink_t, sink_id, g.weight))
+        src_t, src_num, sink_t, sink_num, weight = unpack_fields(self.genome)
+        src_id = np.where(src_t == 0, src_num % MAX_NEURONS, src_num % NUM_SENSORS)
+        sink_id = np.where(sink_t == 0, sink_num % MAX_NEURONS, sink_num % NUM_ACTIONS)
 
-    def get_sensor(self, index, grid, time_step):
-        if not self.alive: return 0.0
-        
-        if index == S_LOC_X: return self.x / grid.size
-        if index == S_LOC_Y: return self.y / grid.size
-        if index == S_RANDOM: return random.random()
-        if index == S_LAST_MOVE_X: return (self.last_move[0] + 1) / 2
-        if index == S_LAST_MOVE_Y: return (self.last_move[1] + 1) / 2
-        if index == S_OSC: return (math.sin(time_step * 0.1) + 1) / 2
-        
-        if index == S_SMELL: return grid.get_pheromone(self.x, self.y)
-        
-        dx, dy = self.last_move
-        if dx == 0 and dy == 0: dx, dy = 1, 0
-        
-        if index == S_SMELL_FWD: return grid.get_pheromone(self.x + dx, self.y + dy)
-            
-        if index == S_SMELL_LR:
-            lx, ly = -dy, dx 
-            rx, ry = dy, -dx 
-            left_scent = grid.get_pheromone(self.x + dx + lx, self.y + dy + ly)
-            right_scent = grid.get_pheromone(self.x + dx + rx, self.y + dy + ry)
-            return 0.5 + (left_scent - right_scent)
-        
-        if index == S_DANGER:
-            # Danger sensor: detect if an agent ahead has high kill intent
-            nx, ny = self.x + dx, self.y + dy
-            if 0 <= nx < grid.size and 0 <= ny < grid.size:
-                other_id = grid.data[nx][ny]
-                # Note: We need a way to look up agent by ID efficiently or pass agent list
-                # For now, just return a generic value if occupied by agent
-                return 1.0 if other_id > 0 else 0.0
-            return 0.0
-
-        probe_dist = 10
-        if index == S_DIST_BARRIER_FWD:
-            for d in range(1, probe_dist + 1):
-                nx, ny = self.x + dx * d, self.y + dy * d
-                if not (0 <= nx < grid.size and 0 <= ny < grid.size): return (probe_dist - d) / probe_dist 
-                if grid.is_barrier(nx, ny): return (probe_dist - d) / probe_dist 
-            return 0.0
-            
-        if index == S_DIST_SAFE_FWD:
-            for d in range(1, probe_dist + 1):
-                nx, ny = self.x + dx * d, self.y + dy * d
-                if 0 <= nx < grid.size and 0 <= ny < grid.size:
-                    if grid.is_safe_tile(nx, ny): return (probe_dist - d) / probe_dist
-            return 0.0
-
-        if index == S_DENS_AGENTS_FWD:
-            count = 0
-            for d in range(1, probe_dist + 1):
-                nx, ny = self.x + dx * d, self.y + dy * d
-                if grid.is_agent(nx, ny): count += 1
-            return count / probe_dist
+        # 1. Merge parallel edges (first occurrence keeps its place)
+        merged = {}
+        for key, w in zip(zip(src_t.tolist(), src_id.tolist(), sink_t.tolist(), sink_id.tolist()), weight.tolist()):
+            merged[key] = merged.get(key, 0.0) + w
+        edges = [key for key, w in merged.items() if w != 0.0]
 
-        return 0.0
+        # 2. Liveness: neurons fed (transitively) by a sensor, and neurons that reach an action
+        fed, useful = set(), set()
+        changed = True
+        while changed:
+            changed = False
+            for st, si, kt, ki in edges:
+                if kt == 0 and ki not in fed and (st == 1 or si in fed): fed.add(ki); changed = True
+                if st == 0 and si not in useful and (kt == 1 or ki in useful): useful.add(si); changed = True
+        self.live_neurons = frozenset(fed & useful)
 
-    def think(self, grid, time_step):
-        if not self.alive: return 0, 0, [0.0]*NUM_ACTIONS
-        
-        action_levels = [0.0] * NUM_ACTIONS
-        next_neurons = [0.0] * MAX_NEURONS
-        for src_t, src_id, sink_t, sink_id, w in self.connections:
-            val = self.get_sensor(src_id, grid, time_step) if src_t == 1 else self.neurons[src_id]
-            output = val * w
-            if sink_t == 1: action_levels[sink_id] += output
-            else: next_neurons[sink_id] += output
-        for i in range(MAX_NEURONS): self.neurons[i] = math.tanh(next_neurons[i])
-        
-        move_x, move_y = math.tanh(action_levels[A_MOVE_X]), math.tanh(action_levels[A_MOVE_Y])
-        
-        emit_val = math.tanh(action_levels[A_EMIT])
-        if emit_val > 0: grid.add_pheromone(self.x, self.y, emit_val * 0.5)
-        
-        # Kill Intent
-        self.kill_intent = math.tanh(action_levels[A_KILL])
-        
-        dx, dy = 0, 0
-        if random.random() < abs(move_x): dx = 1 if move_x > 0 else -1
-        if random.random() < abs(move_y): dy = 1 if move_y > 0 else -1
-        return dx, dy, action_levels
+        # 3. Keep only the useful subgraph
+        self.connections = [(st, si, kt, ki, merged[(st, si, kt, ki)]) for st, si, kt, ki in edges
+                            if (st == 1 or si in fed) and (kt == 1 or ki in useful)]
+        # Sensors this brain actually reads (each is evaluated once per step)
+        self.used_sensors = frozenset(c[1] for c in self.connections if c[0] == 1)
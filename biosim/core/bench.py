@@ -0,0 +1,148 @@
+import contextlib
+import io
+import json
+import os
+import platform
+import tempfile
+import time
+import numpy as np
+from biosim.core.constants import BARRIER, NUM_SENSORS
+from biosim.core.grid import Grid
+from biosim.core.agent import BRAIN_CACHE
+from biosim.core.simulation import Simulation
+from biosim.core.persistence import save_simulation, load_simulation
+import biosim.core.genome as gen
+
+POPS = (1000, 5000, 10000)
+SIZES = (128, 256, 512)
+SEED = 1234
+BENCHES = ("step", "turnover", "think", "pheromones", "placement", "reproduce", "save_json", "load_json", "save_bsim", "load_bsim")
+# Higher is better only for rates; everything else is a time
+RATE_UNITS = ("steps/s",)
+
+def synthetic_level(size):
+    """
+    Fixed, seed-free benchmark level scaled to the grid: a central safe
+    square ringed by a barrier wall with four gaps, plus two side walls.
+    """
+    grid = Grid(size)
+    c, r = size // 2, size // 10
+    grid.safe_zones[c - r:c + r, c - r:c + r] = True
+    w0, w1, gap = c - 2 * r, c + 2 * r, max(2, r // 2)
+    for lo, hi in ((w0, w0 + 2), (w1 - 2, w1)):
+        grid.data[lo:hi, w0:w1] = BARRIER
+        grid.data[w0:w1, lo:hi] = BARRIER
+    grid.data[c - gap:c + gap, :] = np.where(grid.data[c - gap:c + gap, :] == BARRIER, 0, grid.data[c - gap:c + gap, :])
+    grid.data[:, c - gap:c + gap] = np.where(grid.data[:, c - gap:c + gap] == BARRIER, 0, grid.data[:, c - gap:c + gap])
+    grid.data[size // 8, size // 4:3 * size // 4] = BARRIER
+    grid.data[7 * size // 8, size // 4:3 * size // 4] = BARRIER
+    grid.static_changed()
+    return grid
+
+def make_sim(pop, size, seed=SEED):
+    sim = Simulation(size, seed=seed)
+    sim.grid = synthetic_level(size)
+    sim.pop_size = pop
+    sim.reset()
+    return sim
+
+def best_of(fn, repeats, setup=None):
+    """Fastest of `repeats` runs of fn(), in seconds; setup() runs untimed before each."""
+    best = float("inf")
+    for _ in range(repeats):
+        if setup: setup()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run_bench(name, pop, size, repeats=3, steps=30):
+    """Runs one benchmark case. Returns (value, unit)."""
+    BRAIN_CACHE.clear()
+    sim = make_sim(pop, size)
+    # A few steps so pheromones, positions and neurons are realistic
+    for _ in range(5): sim.step()
+
+    if name == "step":
+        def run():
+            for _ in range(steps): sim.step()
+        sim.steps_per_gen = 10 ** 9
+        return steps / best_of(run, repeats), "steps/s"
+    if name == "turnover":
+        # Whole generation change, brains compiled from scratch each time
+        state = sim.rngs["genetics"].get_state(), sim.rngs["world"].get_state(), sim.agents
+        def restore():
+            sim.rngs["genetics"].set_state(state[0]); sim.rngs["world"].set_state(state[1])
+            sim.set_agents(state[2])
+            BRAIN_CACHE.clear()
+        return best_of(sim.spawn_next_generation, repeats, setup=restore) * 1000, "ms"
+    if name == "think":
+        sensors = np.random.RandomState(SEED).random_sample((len(sim.agents), NUM_SENSORS))
+        alive = np.ones(len(sim.agents), dtype=bool)
+        return best_of(lambda: sim.brain.think(sensors, alive), repeats * 10) * 1000, "ms"
+    if name == "pheromones":
+        grid = sim.grid
+        grid.pheromones[:] = np.random.RandomState(SEED).random_sample((size, size)).astype(np.float32)
+        def run():
+            grid.pheromones_changed()
+            grid.update_pheromones()
+        return best_of(run, repeats * 10) * 1000, "ms"
+    if name == "placement":
+        rng = np.random.RandomState(SEED)
+        return best_of(lambda: sim.grid.find_empty_locations(pop, avoid_safe=True, margin=5, rng=rng), repeats) * 1000, "ms"
+    if name == "reproduce":
+        rng = np.random.RandomState(SEED)
+        genomes = [a.genome for a in sim.agents]
+        parents = rng.randint(0, len(genomes), (pop, 2))
+        def run():
+            flat, lengths = gen.crossover_population(genomes, parents[:, 0], parents[:, 1], unequal_rate=sim.unequal_rate, rng=rng)
+            gen.mutate_population(flat, lengths, sim.mutation_rate, sim.insertion_rate, sim.deletion_rate, rng=rng)
+        return best_of(run, repeats) * 1000, "ms"
+    if name.startswith(("save_", "load_")):
+        action, ext = name.split("_")
+        # save/load report to stdout; keep that out of the results
+        with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+            path = os.path.join(tmp, f"bench.{ext}")
+            save = lambda: save_simulation(path, sim.grid, sim.agents, sim.get_params())
+            if action == "save": return best_of(save, repeats) * 1000, "ms"
+            save()
+            # Warm brain cache: measures the format, not brain compilation
+            return best_of(lambda: load_simulation(path), repeats) * 1000, "ms"
+    raise ValueError(f"Unknown benchmark: {name}")
+
+def run_suite(benches=BENCHES, pops=POPS, sizes=SIZES, repeats=3, progress=None):
+    """Runs every (bench, pop, size) case. Returns the results document."""
+    results = []
+    for name in benches:
+        for size in sizes:
+            # Pheromone diffusion does not depend on the population
+            for pop in (pops[:1] if name == "pheromones" else pops):
+                value, unit = run_bench(name, pop, size, repeats)
+                results.append({"bench": name, "pop": pop, "size": size, "value": value, "unit": unit})
+                if progress: progress(results[-1])
+    return {"meta": {"seed": SEED, "repeats": repeats, "python": platform.python_version(), "numpy": np.__version__,
+                     "machine": platform.machine(), "platform": platform.platform(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+            "results": results}
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Matches cases by (bench, pop, size). Returns [(case, base, new, slowdown,
+    regressed)], slowdown being the relative increase in time (negative when
+    faster). A case regresses when it takes more than `tolerance` longer.
+    """
+    base = {(r["bench"], r["pop"], r["size"]): r for r in baseline["results"]}
+    rows = []
+    for r in results["results"]:
+        b = base.get((r["bench"], r["pop"], r["size"]))
+        if b is None: continue
+        # Rates are inverse times
+        if r["unit"] in RATE_UNITS: slowdown = b["value"] / r["value"] - 1
+        else: slowdown = r["value"] / b["value"] - 1
+        rows.append(((r["bench"], r["pop"], r["size"]), b["value"], r["value"], slowdown, slowdown > tolerance))
+    return rows
+
+def save_results(filename, results):
+    with open(filename, 'w') as f: json.dump(results, f, indent=2)
+
+def load_results(filename):
+    with open(filename) as f: return json.load(f)
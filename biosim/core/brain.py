@@ -0,0 +1,88 @@
+import numpy as np
+from biosim.core.constants import *
+
+# Node tables used by the batched evaluation:
+# sources are [neurons | sensors], sinks are [neurons | actions]
+SOURCE_SLOTS = MAX_NEURONS + NUM_SENSORS
+SINK_SLOTS = MAX_NEURONS + NUM_ACTIONS
+
+class PopulationBrain:
+    """
+    Population-wide brain evaluation.
+    Compiles every agent's connection list into padded (agents x genes)
+    arrays so one step for the whole population is a handful of array ops.
+    Row i belongs to agents[i]; agent.neurons becomes a view of its row.
+    """
+    def __init__(self, agents):
+        n = len(agents)
+        lengths = np.array([len(a.connections) for a in agents], dtype=np.intp)
+        width = int(lengths.max()) if n else 0
+        self.size = n
+
+        # Padding: source 0, sink 0, weight 0.0 (adds nothing to neuron 0)
+        self.src = np.zeros((n, width), dtype=np.intp)
+        self.sink = np.zeros((n, width), dtype=np.intp)
+        self.weight = np.zeros((n, width), dtype=np.float64)
+
+        conns = [c for a in agents for c in a.connections]
+        if conns:
+            table = np.array(conns, dtype=np.float64)
+            rows = np.repeat(np.arange(n), lengths)
+            starts = np.cumsum(lengths) - lengths
+            cols = np.arange(len(conns)) - np.repeat(starts, lengths)
+            src_t, src_id, sink_t, sink_id = table[:, 0], table[:, 1], table[:, 2], table[:, 3]
+            self.src[rows, cols] = (src_id + MAX_NEURONS * src_t).astype(np.intp)
+            self.sink[rows, cols] = (sink_id + MAX_NEURONS * sink_t).astype(np.intp)
+            self.weight[rows, cols] = table[:, 4]
+
+        # Flat index into the (agents x SINK_SLOTS) accumulator
+        self.flat_sink = (self.sink + np.arange(n)[:, None] * SINK_SLOTS).ravel()
+
+        # Neuron columns live in at least one brain; the rest always stay 0
+        live = np.zeros(MAX_NEURONS, dtype=bool)
+        for agent in agents: live[list(agent.live_neurons)] = True
+        self.live_cols = np.flatnonzero(live)
+
+        # Rows of the agents reading each sensor
+        users = [[] for _ in range(NUM_SENSORS)]
+        for i, agent in enumerate(agents):
+            for s in agent.used_sensors: users[s].append(i)
+        self.sensor_users = [np.array(u, dtype=np.intp) for u in users]
+
+        # Neuron state lives here; agents keep a view so the UI sees live values
+        self.neurons = np.zeros((n, MAX_NEURONS), dtype=np.float64)
+        for i, agent in enumerate(agents):
+            self.neurons[i] = agent.neurons
+            agent.neurons = self.neurons[i]
+
+    def sensor_rows(self, alive=None, enabled=None):
+        """
+        Per-sensor arrays of agent rows that need that sensor this step.
+        Dead agents and sensors outside `enabled` are left out.
+        """
+        rows = []
+        for s, users in enumerate(self.sensor_users):
+            if enabled is not None and s not in enabled: users = users[:0]
+            elif alive is not None: users = users[alive[users]]
+            rows.append(users)
+        return rows
+
+    def think(self, sensors, alive=None):
+        """
+        sensors: (agents x NUM_SENSORS) array of sensor values.
+        alive: optional bool mask; dead agents keep their neuron state.
+        Returns raw (pre-tanh) action levels, shape (agents x NUM_ACTIONS).
+        Matches Agent.think: neurons read last step's values (one-step delay).
+        """
+        n = self.size
+        values = np.concatenate((self.neurons, sensors), axis=1)
+        inputs = np.take_along_axis(values, self.src, axis=1)
+        # bincount adds in gene order, like the scalar loop
+        acc = np.bincount(self.flat_sink, weights=(inputs * self.weight).ravel(), minlength=n * SINK_SLOTS)
+        acc = acc.reshape(n, SINK_SLOTS)
+
+        cols = self.live_cols
+        next_neurons = np.tanh(acc[:, cols])
+        if alive is not None: next_neurons = np.where(alive[:, None], next_neurons, self.neurons[:, cols])
+        self.neurons[:, cols] = next_neurons
+        return acc[:, MAX_NEURONS:]
@@ -0,0 +1,80 @@
+import os
+import numpy as np
+from biosim.core.persistence import write_snapshot, read_snapshot
+
+# Record layout: RECORD_MAGIC, generation (<u4), snapshot length (<u8), snapshot
+RECORD_MAGIC = b"BSCK"
+RECORD_HEADER = len(RECORD_MAGIC) + 12
+
+class CheckpointLog:
+    """
+    Append-only log of generation-start snapshots, each stored with the
+    simulation's RNG states. Any generation can then be reached by restoring
+    the nearest earlier checkpoint and replaying forward, which gives exactly
+    the original run.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.index = {} # generation -> offset of its snapshot
+        self.end = 0    # end of the last complete record
+        if os.path.exists(filename): self.scan()
+
+    def scan(self):
+        size = os.path.getsize(self.filename)
+        with open(self.filename, 'rb') as f:
+            while self.end + RECORD_HEADER <= size:
+                f.seek(self.end)
+                head = f.read(RECORD_HEADER)
+                if head[:len(RECORD_MAGIC)] != RECORD_MAGIC: break
+                generation = int(np.frombuffer(head, dtype='<u4', count=1, offset=len(RECORD_MAGIC))[0])
+                length = int(np.frombuffer(head, dtype='<u8', count=1, offset=len(RECORD_MAGIC) + 4)[0])
+                # A record cut short (e.g. by a crash) ends the log
+                if self.end + RECORD_HEADER + length > size: break
+                self.index[generation] = self.end + RECORD_HEADER
+                self.end += RECORD_HEADER + length
+
+    def clear(self):
+        """Empties the log, so a new run never mixes with an old one."""
+        open(self.filename, 'wb').close()
+        self.index, self.end = {}, 0
+
+    def generations(self):
+        return sorted(self.index)
+
+    def append(self, sim):
+        """Records sim's state; only valid at the start of a generation."""
+        if sim.time_step != 0 or sim.generation in self.index: return
+        extra = {f"rng_{name}": arr for name, arr in sim.get_rng_state().items()}
+        mode = 'r+b' if os.path.exists(self.filename) else 'wb'
+        with open(self.filename, mode) as f:
+            # Overwrite any incomplete tail left by an interrupted append
+            f.seek(self.end + RECORD_HEADER)
+            write_snapshot(f, sim.grid, sim.agents, sim.get_params(), extra)
+            end = f.tell()
+            f.seek(self.end)
+            f.write(RECORD_MAGIC + np.array([sim.generation], dtype='<u4').tobytes()
+                    + np.array([end - self.end - RECORD_HEADER], dtype='<u8').tobytes())
+            f.truncate(end)
+        self.index[sim.generation] = self.end + RECORD_HEADER
+        self.end = end
+
+    def nearest(self, generation):
+        """Latest checkpointed generation <= generation, or None."""
+        earlier = [g for g in self.index if g <= generation]
+        return max(earlier) if earlier else None
+
+    def restore(self, sim, generation):
+        """
+        Puts sim at the start of `generation`: loads the nearest checkpoint and
+        replays the generations in between. Returns False if the log has no
+        checkpoint at or before it.
+        """
+        start = self.nearest(generation)
+        if start is None: return False
+        with open(self.filename, 'rb') as f:
+            f.seek(self.index[start])
+            grid, agents, params, arrays = read_snapshot(f)
+        sim.load_state(grid, agents, params)
+        sim.set_rng_state({name[4:]: arr for name, arr in arrays.items() if name.startswith("rng_")})
+        while sim.generation < generation: sim.run_generation()
+        return True
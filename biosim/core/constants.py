@@ -13,6 +13,7 @@ NUM_ACTIONS = 5
 
 # World
 BARRIER = -1 
+PROBE_DIST = 10 # Range of the forward-looking sensors
 
 # Labels
 SENSOR_NAMES = {
@@ -1,12 +1,14 @@
-import random
-import copy
+import numpy as np
 from biosim.core.constants import *
 
+GENE_DTYPE = np.uint32
+
 # Global Config (can be modified by App)
 ENABLED_SENSORS = list(range(NUM_SENSORS))
 ENABLED_ACTIONS = list(range(NUM_ACTIONS))
 
 class Gene:
+    """Single-gene view of one packed 32-bit genome entry (see pack_fields)."""
     __slots__ = ('source_type', 'source_num', 'sink_type', 'sink_num', 'weight')
     def __init__(self):
         self.source_type = 0 
@@ -24,20 +26,11 @@ class Gene:
         g.weight = self.weight
         return g
 
-    def to_hex(self):
-        src_id = self.source_num & 0x7F
-        snk_id = self.sink_num & 0x7F
-        w_int = int(self.weight * 8192.0)
-        w_int = max(-32768, min(32767, w_int))
-        w_int &= 0xFFFF 
-        packed = (self.source_type << 31) | (src_id << 24) | \
-                 (self.sink_type << 23) | (snk_id << 16) | \
-                 w_int
-        return f"{packed:08X}"
+    def to_int(self):
+        return int(pack_fields(self.source_type, self.source_num, self.sink_type, self.sink_num, self.weight))
 
     @staticmethod
-    def from_hex(hex_str):
-        val = int(hex_str, 16)
+    def from_int(val):
         g = Gene()
         g.source_type = (val >> 31) & 1
         g.source_num = (val >> 24) & 0x7F
@@ -48,76 +41,157 @@ class Gene:
         g.weight = w_int / 8192.0
         return g
 
+    def to_hex(self):
+        return f"{self.to_int():08X}"
+
+    @staticmethod
+    def from_hex(hex_str):
+        return Gene.from_int(int(hex_str, 16))
+
+# --- Packed genomes ---
+# A genome is a 1-D uint32 array, one gene per entry, laid out as
+# [src_type:1][src_num:7][sink_type:1][sink_num:7][weight:16 (signed, /8192)]
+
+def pack_fields(source_type, source_num, sink_type, sink_num, weight):
+    """Packs gene fields (scalars or arrays) into uint32 genes."""
+    w_int = np.clip(np.trunc(np.asarray(weight, dtype=np.float64) * 8192.0), -32768, 32767).astype(np.int64) & 0xFFFF
+    packed = (np.asarray(source_type, dtype=np.int64) << 31) | ((np.asarray(source_num, dtype=np.int64) & 0x7F) << 24) | \
+             (np.asarray(sink_type, dtype=np.int64) << 23) | ((np.asarray(sink_num, dtype=np.int64) & 0x7F) << 16) | \
+             w_int
+    return packed.astype(GENE_DTYPE)
+
+def unpack_fields(genome):
+    """(source_type, source_num, sink_type, sink_num, weight) arrays of a packed genome."""
+    g = np.asarray(genome, dtype=GENE_DTYPE)
+    weight = (g & 0xFFFF).astype(np.uint16).view(np.int16) / 8192.0
+    return (g >> 31) & 1, (g >> 24) & 0x7F, (g >> 23) & 1, (g >> 16) & 0x7F, weight
+
+def pack_genome(genes):
+    return np.array([g.to_int() for g in genes], dtype=GENE_DTYPE)
+
+def unpack_genome(genome):
+    return [Gene.from_int(v) for v in genome.tolist()]
+
 def genome_to_hex(genome):
-    return "".join([g.to_hex() for g in genome])
+    return "".join([f"{v:08X}" for v in genome.tolist()])
 
 def genome_from_hex(hex_str):
-    genes = []
-    for i in range(0, len(hex_str), 8):
-        chunk = hex_str[i:i+8]
-        if len(chunk) == 8:
-            genes.append(Gene.from_hex(chunk))
-    return genes
-
-def make_random_gene():
-    g = Gene()
-    # Respect ENABLED sets
-    g.source_type = random.choice([0, 1])
-    if g.source_type == 1: # Sensor
-        g.source_num = random.choice(ENABLED_SENSORS)
-    else: # Neuron
-        g.source_num = random.randint(0, MAX_NEURONS - 1)
-        
-    g.sink_type = random.choice([0, 1])
-    if g.sink_type == 1: # Action
-        g.sink_num = random.choice(ENABLED_ACTIONS)
-    else: # Neuron
-        g.sink_num = random.randint(0, MAX_NEURONS - 1)
-        
-    g.weight = (random.random() * 8.0) - 4.0
-    return g
-
-def mutate_genome(genome, mutation_rate=0.01, insertion_rate=0.05, deletion_rate=0.05):
-    for gene in genome:
-        if random.random() < mutation_rate:
-            trait = random.randint(0, 4)
-            if trait == 0: gene.source_type ^= 1
-            elif trait == 1: 
-                if gene.source_type == 1: gene.source_num = random.choice(ENABLED_SENSORS)
-                else: gene.source_num = random.randint(0, MAX_NEURONS - 1)
-            elif trait == 2: gene.sink_type ^= 1
-            elif trait == 3:
-                if gene.sink_type == 1: gene.sink_num = random.choice(ENABLED_ACTIONS)
-                else: gene.sink_num = random.randint(0, MAX_NEURONS - 1)
-            elif trait == 4: gene.weight += (random.random() - 0.5) * 2.0
-            
-    if random.random() < deletion_rate and len(genome) > 1:
-        del genome[random.randint(0, len(genome)-1)]
-    if random.random() < insertion_rate:
-        genome.append(make_random_gene())
-
-def recombine_dna(dna1, dna2):
-    if not dna1: return dna2
-    if not dna2: return dna1
-    limit = min(len(dna1), len(dna2))
-    if limit < 2: return dna1
-    pivot = random.randint(1, limit - 1)
-    return dna1[:pivot] + dna2[pivot:]
-
-def recombine_dna_unequal(dna1, dna2):
-    if not dna1: return dna2
-    if not dna2: return dna1
-    len1, len2 = len(dna1), len(dna2)
-    pivot1 = random.randint(0, len1)
-    jitter = random.randint(-16, 16)
-    pivot2 = max(0, min(len2, pivot1 + jitter))
-    return dna1[:pivot1] + dna2[pivot2:]
-
-def crossover_genomes(g1, g2, unequal_rate=0.0):
-    dna1 = genome_to_hex(g1)
-    dna2 = genome_to_hex(g2)
-    if random.random() < unequal_rate:
-        child_dna = recombine_dna_unequal(dna1, dna2)
-    else:
-        child_dna = recombine_dna(dna1, dna2)
-    return genome_from_hex(child_dna)
\ No newline at end of file
+    # Trailing partial genes are dropped
+    usable = len(hex_str) - len(hex_str) % 8
+    return np.frombuffer(bytes.fromhex(hex_str[:usable]), dtype='>u4').astype(GENE_DTYPE)
+
+def make_random_genes(count, rng=np.random):
+    """`count` packed random genes, drawn from the enabled sensors and actions. rng: a RandomState (default: the global one)."""
+    src_t = rng.randint(0, 2, count)
+    src = np.where(src_t == 1, rng.choice(ENABLED_SENSORS, count), rng.randint(0, MAX_NEURONS, count))
+    sink_t = rng.randint(0, 2, count)
+    sink = np.where(sink_t == 1, rng.choice(ENABLED_ACTIONS, count), rng.randint(0, MAX_NEURONS, count))
+    weight = rng.random(count) * 8.0 - 4.0
+    return pack_fields(src_t, src, sink_t, sink, weight)
+
+# --- Batched reproduction ---
+# Offspring are handled as one flat gene array plus per-child lengths.
+
+def split_genomes(flat, lengths):
+    return np.split(flat, np.cumsum(lengths)[:-1]) if len(lengths) else []
+
+def splice_genomes(genomes, parents1, parents2, cut1, cut2):
+    """
+    Child c = DNA(parents1[c])[:cut1[c]] + DNA(parents2[c])[cut2[c]:], with cuts
+    counted in hex characters (nibbles) as in the hex DNA strings. A cut inside
+    a gene fuses the high nibbles of one parent's gene with the low nibbles of
+    the other's ("hybrid" genes); unequal cuts shift the rest of parent 2 by
+    whole nibbles. Trailing partial genes are dropped.
+    Returns (flat genes, lengths).
+    """
+    lens = np.array([len(g) for g in genomes], dtype=np.int64)
+    starts = np.cumsum(lens) - lens
+    pool = np.concatenate([np.asarray(g, dtype=np.uint64) for g in genomes] + [np.zeros(1, dtype=np.uint64)])
+    cut1, cut2 = np.asarray(cut1, dtype=np.int64), np.asarray(cut2, dtype=np.int64)
+
+    lengths = (cut1 + lens[parents2] * 8 - cut2) // 8
+    total = int(lengths.sum())
+    child = np.repeat(np.arange(len(lengths)), lengths)
+    k = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    def gene_at(parents, idx):
+        # Genes outside the parent read as 0 (they are always masked out)
+        p = parents[child]
+        valid = (idx >= 0) & (idx < lens[p])
+        return np.where(valid, pool[np.where(valid, starts[p] + idx, len(pool) - 1)], 0).astype(np.uint64)
+
+    # Parent 2's stream, shifted so nibble j of the child reads nibble j + shift
+    q, r = np.divmod(8 * k + (cut2 - cut1)[child], 8)
+    r = (4 * r).astype(np.uint64)
+    shifted = ((gene_at(parents2, q) << r) | (gene_at(parents2, q + 1) >> (np.uint64(32) - r))) & np.uint64(0xFFFFFFFF)
+
+    # High nibbles of the gene still come from parent 1
+    m = np.clip(cut1[child] - 8 * k, 0, 8).astype(np.uint64)
+    hi = (np.uint64(0xFFFFFFFF) << (np.uint64(32) - 4 * m)) & np.uint64(0xFFFFFFFF)
+    out = (gene_at(parents1, k) & hi) | (shifted & ~hi & np.uint64(0xFFFFFFFF))
+    return out.astype(GENE_DTYPE), lengths
+
+def crossover_population(genomes, parents1, parents2, unequal_rate=0.0, rng=np.random):
+    """
+    Crossover for a whole offspring population. genomes: parent genomes;
+    parents1/parents2: parent indices per child.
+    Equal crossover cuts both parents at the same character in [1, limit - 1];
+    unequal crossover cuts parent 1 anywhere and parent 2 within +/-16 characters.
+    """
+    n = len(parents1)
+    lens = np.array([len(g) for g in genomes], dtype=np.int64)
+    len1, len2 = lens[parents1] * 8, lens[parents2] * 8
+
+    limit = np.minimum(len1, len2)
+    pivot = rng.randint(1, np.maximum(limit, 2))
+    cut1 = np.where(limit < 2, len1, pivot)
+    cut2 = np.where(limit < 2, len2, pivot)
+
+    unequal = rng.random(n) < unequal_rate
+    u1 = rng.randint(0, len1 + 1)
+    u2 = np.clip(u1 + rng.randint(-16, 17, n), 0, len2)
+    cut1, cut2 = np.where(unequal, u1, cut1), np.where(unequal, u2, cut2)
+
+    # An empty parent contributes nothing: the child is the other parent
+    cut1, cut2 = np.where(len2 == 0, len1, cut1), np.where(len2 == 0, 0, cut2)
+    cut1, cut2 = np.where(len1 == 0, 0, cut1), np.where(len1 == 0, 0, cut2)
+    return splice_genomes(genomes, parents1, parents2, cut1, cut2)
+
+def mutate_population(flat, lengths, mutation_rate=0.01, insertion_rate=0.05, deletion_rate=0.05, rng=np.random):
+    """
+    Mutates every child of (flat genes, lengths) at once.
+    Point mutations flip a type bit, redraw a source/sink id or drift the
+    weight; then each child may lose one random gene and gain one at the end.
+    Returns new (flat genes, lengths).
+    """
+    genes = np.array(flat, dtype=GENE_DTYPE)
+    lengths = np.array(lengths, dtype=np.int64)
+
+    hit = np.flatnonzero(rng.random(len(genes)) < mutation_rate)
+    if len(hit):
+        trait = rng.randint(0, 5, len(hit))
+        v = genes[hit].astype(np.int64)
+        v ^= np.where(trait == 0, 1 << 31, 0) | np.where(trait == 2, 1 << 23, 0)
+        src = np.where((v >> 31) & 1, rng.choice(ENABLED_SENSORS, len(hit)), rng.randint(0, MAX_NEURONS, len(hit)))
+        v = np.where(trait == 1, (v & ~(0x7F << 24)) | (src << 24), v)
+        sink = np.where((v >> 23) & 1, rng.choice(ENABLED_ACTIONS, len(hit)), rng.randint(0, MAX_NEURONS, len(hit)))
+        v = np.where(trait == 3, (v & ~(0x7F << 16)) | (sink << 16), v)
+        weight = (v & 0xFFFF).astype(np.uint16).view(np.int16) / 8192.0 + (rng.random(len(hit)) - 0.5) * 2.0
+        w_int = np.clip(np.trunc(weight * 8192.0), -32768, 32767).astype(np.int64) & 0xFFFF
+        v = np.where(trait == 4, (v & ~0xFFFF) | w_int, v)
+        genes[hit] = v.astype(GENE_DTYPE)
+
+    n = len(lengths)
+    deleted = (rng.random(n) < deletion_rate) & (lengths > 1)
+    if deleted.any():
+        starts = np.cumsum(lengths) - lengths
+        pos = starts[deleted] + rng.randint(0, lengths[deleted])
+        genes = np.delete(genes, pos)
+        lengths = lengths - deleted
+
+    inserted = rng.random(n) < insertion_rate
+    if inserted.any():
+        ends = np.cumsum(lengths)[inserted]
+        genes = np.insert(genes, ends, make_random_genes(len(ends), rng))
+        lengths = lengths + inserted
+    return genes, lengths
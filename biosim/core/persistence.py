@@ -1,32 +1,35 @@
 import json
 import os
+import numpy as np
 from biosim.core.grid import Grid
 from biosim.core.agent import Agent
-from biosim.core.genome import genome_to_hex, genome_from_hex
+from biosim.core.genome import GENE_DTYPE, genome_to_hex, genome_from_hex, split_genomes
 from biosim.core.constants import BARRIER
 
+# Binary snapshots: magic, format version and header length, then a JSON
+# header (params, grid size, array table) and the raw arrays, each aligned
+# to SNAPSHOT_ALIGN bytes so they can be memory-mapped in place.
+SNAPSHOT_EXT = ".bsim"
+SNAPSHOT_MAGIC = b"BIOSIMSN"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_ALIGN = 64
+
 def save_simulation(filename, grid, agents, params):
     """
-    Saves the entire simulation state to a JSON file.
+    Saves the entire simulation state to a JSON file, or to a binary
+    snapshot if the name ends in SNAPSHOT_EXT.
     """
+    if filename.endswith(SNAPSHOT_EXT): return save_snapshot(filename, grid, agents, params)
     data = {
         "params": params,
         "grid": {
             "size": grid.size,
-            "barriers": [],
-            "safe_zones": []
+            "barriers": np.argwhere(grid.barrier_mask()).tolist(),
+            "safe_zones": np.argwhere(grid.safe_zones).tolist()
         },
         "agents": []
     }
 
-    # Serialize Grid
-    for x in range(grid.size):
-        for y in range(grid.size):
-            if grid.is_barrier(x, y):
-                data["grid"]["barriers"].append((x, y))
-            if grid.is_safe_tile(x, y):
-                data["grid"]["safe_zones"].append((x, y))
-
     # Serialize Agents
     for agent in agents:
         agent_data = {
@@ -46,14 +49,21 @@ def save_simulation(filename, grid, agents, params):
         print(f"Error saving file: {e}")
         return False
 
-def load_simulation(filename):
+def in_grid(coords, size):
+    """The rows of an (n x 2) coordinate array that lie inside a size x size grid."""
+    return coords[((0 <= coords) & (coords < size)).all(axis=1)]
+
+def load_simulation(filename, mmap=False):
     """
-    Loads simulation state from a JSON file.
+    Loads simulation state from a JSON file or a binary snapshot (detected
+    from the file contents, not the name).
+    mmap: map snapshot arrays instead of reading them (ignored for JSON).
     Returns: (grid, agents, params)
     """
     if not os.path.exists(filename):
         print(f"File not found: {filename}")
         return None
+    if is_snapshot(filename): return load_snapshot(filename, mmap)
 
     try:
         with open(filename, 'r') as f:
@@ -67,11 +77,12 @@ def load_simulation(filename):
         size = grid_data["size"]
         grid = Grid(size)
         
-        for x, y in grid_data["barriers"]:
-            grid.set(x, y, BARRIER)
-            
-        for x, y in grid_data["safe_zones"]:
-            grid.set_safe(x, y, True)
+        # Out-of-range cells are skipped, as Grid.set/set_safe would
+        barriers = in_grid(np.array(grid_data["barriers"], dtype=np.intp).reshape(-1, 2), size)
+        grid.data[barriers[:, 0], barriers[:, 1]] = BARRIER
+        safe = in_grid(np.array(grid_data["safe_zones"], dtype=np.intp).reshape(-1, 2), size)
+        grid.safe_zones[safe[:, 0], safe[:, 1]] = True
+        grid.static_changed()
 
         # 3. Restore Agents
         agents = []
@@ -91,3 +102,118 @@ def load_simulation(filename):
     except Exception as e:
         print(f"Error loading file: {e}")
         return None
+
+
+def is_snapshot(filename):
+    with open(filename, 'rb') as f:
+        return f.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+
+def write_snapshot(f, grid, agents, params, extra=None):
+    """
+    Writes a binary snapshot at the current position of the binary file f:
+    grid layers as packed bitmaps, pheromones, agent ids/positions as int32
+    arrays and all genomes as one packed uint32 array plus per-agent lengths.
+    extra: optional {name: array} stored alongside (see read_snapshot).
+    """
+    genomes = [a.genome for a in agents]
+    arrays = {
+        "barriers": np.packbits(grid.barrier_mask()),
+        "safe_zones": np.packbits(grid.safe_zones),
+        "pheromones": grid.pheromones,
+        "ids": np.array([a.id for a in agents], dtype=np.int32),
+        "xs": np.array([a.x for a in agents], dtype=np.int32),
+        "ys": np.array([a.y for a in agents], dtype=np.int32),
+        "genome_lengths": np.array([len(g) for g in genomes], dtype=np.int32),
+        "genomes": np.concatenate(genomes).astype(GENE_DTYPE) if genomes else np.zeros(0, dtype=GENE_DTYPE),
+        **(extra or {}),
+    }
+    # Array offsets are relative to the end of the (padded) header
+    table, offset = {}, 0
+    for name, arr in arrays.items():
+        table[name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+        offset += -(-arr.nbytes // SNAPSHOT_ALIGN) * SNAPSHOT_ALIGN
+    header = json.dumps({"params": params, "size": grid.size, "arrays": table}).encode()
+    prefix = len(SNAPSHOT_MAGIC) + 8
+    header += b" " * (-(prefix + len(header)) % SNAPSHOT_ALIGN)
+
+    f.write(SNAPSHOT_MAGIC)
+    f.write(np.array([SNAPSHOT_VERSION, len(header)], dtype='<u4').tobytes())
+    f.write(header)
+    for arr in arrays.values():
+        f.write(np.ascontiguousarray(arr).tobytes())
+        f.write(b"\0" * (-arr.nbytes % SNAPSHOT_ALIGN))
+
+def read_snapshot(f, mmap_file=None):
+    """
+    Reads the snapshot starting at the current position of the binary file f.
+    mmap_file: name of the file behind f; if given, arrays (genomes included)
+    are read-only views of the mapped file instead of copies.
+    Returns: (grid, agents, params, arrays), arrays holding every stored
+    array by name (including any `extra` ones).
+    """
+    if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC: raise ValueError("not a snapshot")
+    version, header_len = np.frombuffer(f.read(8), dtype='<u4').tolist()
+    if version > SNAPSHOT_VERSION: raise ValueError(f"unsupported snapshot version {version}")
+    header = json.loads(f.read(header_len))
+    base = f.tell()
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype, shape = np.dtype(spec["dtype"]), tuple(spec["shape"])
+        count = int(np.prod(shape))
+        if mmap_file and count:
+            arrays[name] = np.memmap(mmap_file, dtype=dtype, mode='r', offset=base + spec["offset"], shape=shape)
+        else:
+            f.seek(base + spec["offset"])
+            arrays[name] = np.frombuffer(f.read(count * dtype.itemsize), dtype=dtype).reshape(shape)
+    # Leave f at the end of the snapshot
+    f.seek(base + sum(-(-arr.nbytes // SNAPSHOT_ALIGN) * SNAPSHOT_ALIGN for arr in arrays.values()))
+
+    # 1. Restore Grid
+    size = header["size"]
+    grid = Grid(size)
+    cells = size * size
+    grid.data[np.unpackbits(arrays["barriers"], count=cells).reshape(size, size).astype(bool)] = BARRIER
+    grid.safe_zones[:] = np.unpackbits(arrays["safe_zones"], count=cells).reshape(size, size).astype(bool)
+    grid.static_changed()
+    if "pheromones" in arrays:
+        grid.pheromones[:] = arrays["pheromones"]
+        grid.pheromones_changed()
+
+    # 2. Restore Agents
+    ids, xs, ys = (np.asarray(arrays[k], dtype=np.intp) for k in ("ids", "xs", "ys"))
+    genomes = split_genomes(arrays["genomes"], arrays["genome_lengths"])
+    agents = [Agent(x, y, genome=g, agent_id=i) for i, x, y, g in zip(ids.tolist(), xs.tolist(), ys.tolist(), genomes)]
+    # Place in grid if space available (avoids corruption if file bad)
+    free = grid.data[xs, ys] != BARRIER
+    grid.data[xs[free], ys[free]] = ids[free]
+    return grid, agents, header["params"], arrays
+
+def save_snapshot(filename, grid, agents, params):
+    """Saves the simulation state as a binary snapshot file (see write_snapshot)."""
+    try:
+        # Write aside and swap in, so a snapshot still mapped by a previous
+        # load is never truncated under it
+        tmp = filename + ".tmp"
+        with open(tmp, 'wb') as f:
+            write_snapshot(f, grid, agents, params)
+        os.replace(tmp, filename)
+        print(f"Simulation saved to {filename}")
+        return True
+    except Exception as e:
+        print(f"Error saving file: {e}")
+        return False
+
+def load_snapshot(filename, mmap=False):
+    """
+    Loads a binary snapshot file. With mmap, the arrays are memory-mapped.
+    Returns: (grid, agents, params)
+    """
+    try:
+        with open(filename, 'rb') as f:
+            grid, agents, params, _ = read_snapshot(f, filename if mmap else None)
+        print(f"Simulation loaded from {filename}")
+        return grid, agents, params
+
+    except Exception as e:
+        print(f"Error loading file: {e}")
+        return None
@@ -0,0 +1,59 @@
+import csv
+import time
+
+class PhaseTimer:
+    """
+    Accumulates wall time and call counts per named phase of a loop:
+        timer.start(); work(); timer.lap("work"); more(); timer.lap("more")
+    Each lap charges the time since the previous start()/lap() to its phase.
+    When disabled, start() and lap() return immediately.
+    Totals only grow; readers diff two snapshot()s to get a window.
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.times = {}  # phase -> seconds
+        self.counts = {} # phase -> calls
+        self.last = 0.0
+
+    def start(self):
+        if self.enabled: self.last = time.perf_counter()
+
+    def lap(self, phase):
+        if not self.enabled: return
+        now = time.perf_counter()
+        self.times[phase] = self.times.get(phase, 0.0) + now - self.last
+        self.counts[phase] = self.counts.get(phase, 0) + 1
+        self.last = now
+
+    def snapshot(self):
+        """{phase: (seconds, calls)} totals so far."""
+        return {phase: (self.times[phase], self.counts[phase]) for phase in self.times}
+
+def profile_delta(before, after):
+    """[(phase, seconds, calls)] spent between two snapshots, in phase order."""
+    rows = []
+    for phase, (seconds, calls) in after.items():
+        s0, c0 = before.get(phase, (0.0, 0))
+        if calls > c0: rows.append((phase, seconds - s0, calls - c0))
+    return rows
+
+class ProfileWriter:
+    """Streams per-generation phase timings to a CSV file."""
+    FIELDS = ["generation", "phase", "calls", "total_ms", "ms_per_call"]
+
+    def __init__(self, filename, timer):
+        self.timer = timer
+        self.prev = timer.snapshot()
+        self.file = open(filename, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(self.FIELDS)
+
+    def write_generation(self, generation):
+        now = self.timer.snapshot()
+        for phase, seconds, calls in profile_delta(self.prev, now):
+            self.writer.writerow([generation, phase, calls, f"{seconds * 1000:.3f}", f"{seconds * 1000 / calls:.4f}"])
+        self.file.flush()
+        self.prev = now
+
+    def close(self):
+        self.file.close()
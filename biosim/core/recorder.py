@@ -0,0 +1,91 @@
+import json
+import os
+import numpy as np
+from biosim.core.constants import NUM_ACTIONS
+
+# Recorded fields: (dtype, per-agent shape)
+FIELDS = {
+    "positions": (np.int16, (2,)),
+    "alive": (np.bool_, ()),
+    "kill_intent": (np.float32, ()),
+    "actions": (np.float32, (NUM_ACTIONS,)), # raw (pre-tanh) action levels
+}
+INDEX_FILE = "index.json"
+
+def field_file(directory, generation, field):
+    return os.path.join(directory, f"gen_{generation:06d}_{field}.npy")
+
+class TrajectoryRecorder:
+    """
+    Opt-in per-step recorder (set Simulation.recorder). Each generation gets
+    one preallocated .npy file per field, shaped (steps, agents, ...), which
+    is filled through a memory map. Steps are buffered in RAM and written
+    CHUNK steps at a time. index.json lists the recorded generations.
+    """
+    CHUNK = 32
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, INDEX_FILE)
+        self.index = {"fields": list(FIELDS), "generations": {}}
+        if os.path.exists(path):
+            with open(path) as f: self.index = json.load(f)
+        self.generation = None
+
+    def begin(self, generation, n_agents, steps, first_step):
+        self.generation, self.first_step, self.steps, self.count = generation, first_step, steps - first_step, 0
+        self.files = {name: np.lib.format.open_memmap(field_file(self.directory, generation, name), mode='w+', dtype=dtype, shape=(self.steps, n_agents) + shape)
+                      for name, (dtype, shape) in FIELDS.items()}
+        self.buffers = {name: np.zeros((self.CHUNK, n_agents) + shape, dtype=dtype) for name, (dtype, shape) in FIELDS.items()}
+        self.buffered = 0
+
+    def record(self, sim, xs, ys, alive, levels):
+        """Stores one step: positions and alive flags after it, kill intents and action levels computed in it."""
+        if self.generation != sim.generation:
+            self.close()
+            self.begin(sim.generation, len(sim.agents), sim.steps_per_gen, sim.time_step)
+        if self.count + self.buffered >= self.steps: return
+        i = self.buffered
+        buf = self.buffers
+        buf["positions"][i, :, 0], buf["positions"][i, :, 1] = xs, ys
+        buf["alive"][i] = alive
+        buf["kill_intent"][i] = sim.kill_intent
+        buf["actions"][i] = levels
+        self.buffered += 1
+        if self.buffered == self.CHUNK or self.count + self.buffered == self.steps: self.flush()
+
+    def flush(self):
+        k, start = self.buffered, self.count
+        if k == 0: return
+        for name, mm in self.files.items(): mm[start:start + k] = self.buffers[name][:k]
+        self.count += k
+        self.buffered = 0
+
+    def close(self):
+        """Finishes the current generation and updates the index."""
+        if self.generation is None: return
+        self.flush()
+        for mm in self.files.values(): mm.flush()
+        n_agents = next(iter(self.files.values())).shape[1]
+        self.index["generations"][str(self.generation)] = {"agents": n_agents, "steps": self.count, "first_step": self.first_step}
+        with open(os.path.join(self.directory, INDEX_FILE), 'w') as f: json.dump(self.index, f, indent=2)
+        self.generation, self.files, self.buffers = None, {}, {}
+
+class Recording:
+    """Lazy reader for a TrajectoryRecorder directory; nothing is loaded until used."""
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, INDEX_FILE)) as f: self.index = json.load(f)
+
+    def generations(self):
+        return sorted(int(g) for g in self.index["generations"])
+
+    def load(self, generation):
+        """
+        {field: read-only memory-mapped array (steps, agents, ...)} for one
+        generation. Step i is time step first_step + i of that generation.
+        """
+        info = self.index["generations"][str(generation)]
+        return {name: np.load(field_file(self.directory, generation, name), mmap_mode='r')[:info["steps"]]
+                for name in self.index["fields"]}
@@ -0,0 +1,77 @@
+import math
+import numpy as np
+from biosim.core.constants import *
+
+# Probe sensor value for a hit at distance d (index PROBE_DIST + 1: no hit)
+PROBE_VALUE = np.array([(PROBE_DIST - d) / PROBE_DIST for d in range(PROBE_DIST + 1)] + [0.0])
+
+def forward_dirs(last_dx, last_dy):
+    """Facing direction per agent: the last move, or +X if it never moved."""
+    still = (last_dx == 0) & (last_dy == 0)
+    return np.where(still, 1, last_dx), np.where(still, 0, last_dy)
+
+def sample(layer, xs, ys, fill=0):
+    """Reads layer[x, y] for every agent; out-of-bounds cells read as fill."""
+    size = layer.shape[0]
+    inb = (xs >= 0) & (xs < size) & (ys >= 0) & (ys < size)
+    vals = layer[np.clip(xs, 0, size - 1), np.clip(ys, 0, size - 1)]
+    return np.where(inb, vals, fill), inb
+
+def compute_sensors(grid, xs, ys, last_dx, last_dy, time_step, rows=None, slots=None, kill_intent=None, rng=np.random):
+    """
+    All sensors for all agents at once.
+    xs, ys, last_dx, last_dy: int arrays, one entry per agent.
+    rows: optional per-sensor arrays of the agent rows that need it
+          (see PopulationBrain.sensor_rows); other entries stay 0.
+    slots, kill_intent: id -> row index and per-row kill intent, used by
+          S_DANGER; without them it only reports occupancy.
+    rng: RandomState for S_RANDOM.
+    Returns an (agents x NUM_SENSORS) float array.
+    """
+    n = len(xs)
+    out = np.zeros((n, NUM_SENSORS))
+    if rows is None: rows = [np.arange(n)] * NUM_SENSORS
+    need = {s: r for s, r in enumerate(rows) if len(r)}
+    if not need: return out
+    size = grid.size
+    ph = grid.pheromones
+    # Per-step shared values
+    dx, dy = forward_dirs(last_dx, last_dy)
+
+    if S_LOC_X in need: r = need[S_LOC_X]; out[r, S_LOC_X] = xs[r] / size
+    if S_LOC_Y in need: r = need[S_LOC_Y]; out[r, S_LOC_Y] = ys[r] / size
+    if S_RANDOM in need: r = need[S_RANDOM]; out[r, S_RANDOM] = rng.random(len(r))
+    if S_LAST_MOVE_X in need: r = need[S_LAST_MOVE_X]; out[r, S_LAST_MOVE_X] = (last_dx[r] + 1) / 2
+    if S_LAST_MOVE_Y in need: r = need[S_LAST_MOVE_Y]; out[r, S_LAST_MOVE_Y] = (last_dy[r] + 1) / 2
+    if S_OSC in need: out[need[S_OSC], S_OSC] = (math.sin(time_step * 0.1) + 1) / 2
+
+    if S_SMELL in need: r = need[S_SMELL]; out[r, S_SMELL] = ph[xs[r], ys[r]]
+    if S_SMELL_FWD in need:
+        r = need[S_SMELL_FWD]
+        out[r, S_SMELL_FWD] = sample(ph, xs[r] + dx[r], ys[r] + dy[r])[0]
+    if S_SMELL_LR in need:
+        r = need[S_SMELL_LR]
+        fx, fy, rdx, rdy = xs[r] + dx[r], ys[r] + dy[r], dx[r], dy[r]
+        left, _ = sample(ph, fx - rdy, fy + rdx)
+        right, _ = sample(ph, fx + rdy, fy - rdx)
+        out[r, S_SMELL_LR] = 0.5 + (left - right)
+    if S_DANGER in need:
+        r = need[S_DANGER]
+        ahead = sample(grid.occupancy(), xs[r] + dx[r], ys[r] + dy[r])[0]
+        if slots is None: out[r, S_DANGER] = ahead > 0
+        else:
+            slot = np.where(ahead > 0, slots[np.clip(ahead, 0, len(slots) - 1)], -1)
+            out[r, S_DANGER] = np.where(slot >= 0, np.maximum(kill_intent[slot], 0.0), 0.0)
+
+    # Barriers and safe zones are static: precomputed tables (see Grid.probe_ahead)
+    if S_DIST_BARRIER_FWD in need:
+        r = need[S_DIST_BARRIER_FWD]
+        out[r, S_DIST_BARRIER_FWD] = PROBE_VALUE[grid.probe_ahead(0, xs[r], ys[r], dx[r], dy[r])]
+    if S_DIST_SAFE_FWD in need:
+        r = need[S_DIST_SAFE_FWD]
+        out[r, S_DIST_SAFE_FWD] = PROBE_VALUE[grid.probe_ahead(1, xs[r], ys[r], dx[r], dy[r])]
+
+    if S_DENS_AGENTS_FWD in need:
+        r = need[S_DENS_AGENTS_FWD]
+        out[r, S_DENS_AGENTS_FWD] = grid.agents_ahead(xs[r], ys[r], dx[r], dy[r]) / PROBE_DIST
+    return out
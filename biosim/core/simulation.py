@@ -0,0 +1,310 @@
+import numpy as np
+from biosim.core.constants import *
+from biosim.core.grid import Grid
+from biosim.core.agent import Agent, BRAIN_CACHE
+from biosim.core.brain import PopulationBrain
+from biosim.core.sensors import compute_sensors
+from biosim.core.profiler import PhaseTimer
+from biosim.core.stats import GenerationStats
+import biosim.core.genome as gen
+
+DEFAULT_TRAITS = {"Vision": True, "Smell": True, "Osc": True, "Mem": True, "Emit": True, "Kill": False}
+# Independent random streams: spawn placement, breeding/mutation, and
+# per-step behaviour (S_RANDOM, movement dice, action order)
+RNG_STREAMS = ("world", "genetics", "behavior")
+
+class Simulation:
+    """
+    Headless simulation engine. Owns the grid, the population and the
+    evolution parameters; the pygame App is only a viewer driving it.
+    """
+    def __init__(self, grid_size=128, seed=None, brain_cache=None):
+        self.grid = Grid(grid_size)
+        # The compiled-brain cache is per process; brain_cache re-bounds it (entries)
+        if brain_cache is not None: BRAIN_CACHE.resize(brain_cache)
+        # Per-generation metrics, filled in as the run goes
+        self.stats = GenerationStats()
+        self.set_agents([])
+        self.generation = 1
+        self.time_step = 0
+        self.last_survivors = 0
+        self.seed(seed)
+        # Optional CheckpointLog, written every checkpoint_every generations
+        self.checkpoint_log = None
+        self.checkpoint_every = 1
+        # Optional TrajectoryRecorder, fed after every step
+        self.recorder = None
+        # Per-phase step timings (disabled by default)
+        self.timer = PhaseTimer()
+
+        # Params
+        self.mutation_rate = 0.01
+        self.insertion_rate = 0.01
+        self.deletion_rate = 0.01
+        self.unequal_rate = 0.0
+        self.pop_size = 1000
+        self.genome_len = 12
+        self.steps_per_gen = 300
+        self.spawn_away = False
+
+        self.enabled_traits = dict(DEFAULT_TRAITS)
+        self.sync_genetic_config()
+
+    def sync_genetic_config(self):
+        sensors = [S_LOC_X, S_LOC_Y, S_RANDOM]
+        if self.enabled_traits["Vision"]: sensors += SENSOR_GROUPS["Vision"]
+        if self.enabled_traits["Smell"]: sensors += SENSOR_GROUPS["Smell"]
+        if self.enabled_traits["Osc"]: sensors += SENSOR_GROUPS["Osc"]
+        if self.enabled_traits["Mem"]: sensors += SENSOR_GROUPS["Mem"]
+        if self.enabled_traits["Kill"]: sensors += SENSOR_GROUPS["Danger"]
+        gen.ENABLED_SENSORS = sorted(list(set(sensors)))
+
+        actions = [A_MOVE_X, A_MOVE_Y, A_MOVE_FWD]
+        if self.enabled_traits["Emit"]: actions += ACTION_GROUPS["Emit"]
+        if self.enabled_traits["Kill"]: actions += ACTION_GROUPS["Kill"]
+        gen.ENABLED_ACTIONS = sorted(list(set(actions)))
+
+    # --- Randomness ---
+    def seed(self, seed=None):
+        """Re-seeds every RNG stream; a None seed draws a fresh one. Returns the seed."""
+        if seed is None: seed = int(np.random.SeedSequence().entropy)
+        self.seed_value = seed
+        streams = np.random.SeedSequence(seed).spawn(len(RNG_STREAMS))
+        self.rngs = {name: np.random.RandomState(np.random.MT19937(ss)) for name, ss in zip(RNG_STREAMS, streams)}
+        return seed
+
+    def get_rng_state(self):
+        """{stream: uint32 array} (MT19937 key followed by the position)."""
+        state = {}
+        for name, rng in self.rngs.items():
+            _, key, pos = rng.get_state()[:3]
+            state[name] = np.append(key, pos).astype(np.uint32)
+        return state
+
+    def set_rng_state(self, state):
+        # Gaussian draws are never used, so their cache is not stored
+        for name, arr in state.items(): self.rngs[name].set_state(("MT19937", arr[:-1], int(arr[-1]), 0, 0.0))
+
+    # --- Params (same keys as the save files) ---
+    def get_params(self):
+        return {"gen": self.generation, "step": self.time_step, "mut": self.mutation_rate, "ins": self.insertion_rate,
+                "del": self.deletion_rate, "uneq": self.unequal_rate, "pop": self.pop_size, "glen": self.genome_len,
+                "steps": self.steps_per_gen, "traits": self.enabled_traits, "spawn_away": self.spawn_away, "size": self.grid.size}
+
+    def set_params(self, params):
+        self.generation, self.time_step = params.get("gen", 1), params.get("step", 0)
+        self.mutation_rate, self.insertion_rate = params.get("mut", 0.01), params.get("ins", 0.01)
+        self.deletion_rate, self.unequal_rate = params.get("del", 0.01), params.get("uneq", 0.0)
+        self.pop_size, self.genome_len, self.steps_per_gen = params.get("pop", 1000), params.get("glen", 12), params.get("steps", 300)
+        self.spawn_away = params.get("spawn_away", False)
+        # Saves store the grid itself; a different size (an override) resizes the world
+        if params.get("size", self.grid.size) != self.grid.size: self.resize(params["size"])
+        # Older saves may lack newer traits (e.g. Kill)
+        self.enabled_traits = {**DEFAULT_TRAITS, **params.get("traits", {})}
+        self.sync_genetic_config()
+
+    def update_params(self, overrides):
+        """Applies a partial params dict, e.g. {"mut": 0.02, "traits": {"Kill": True}}."""
+        params = self.get_params()
+        traits = {**params["traits"], **overrides.get("traits", {})}
+        self.set_params({**params, **overrides, "traits": traits})
+
+    def load_state(self, grid, agents, params):
+        self.grid = grid
+        self.set_agents(agents)
+        self.set_params(params)
+        self.stats.clear()
+
+    def resize(self, size):
+        """Changes the world size, keeping the level where it fits. Clears the population."""
+        self.grid = self.grid.resized(size)
+        self.set_agents([])
+
+    def set_agents(self, agents):
+        """Replaces the population, rebuilds the id index and recompiles the batched brain."""
+        self.agents = agents
+        self.brain = PopulationBrain(agents)
+        # slots[agent_id] -> row in self.agents, -1 if none/dead
+        ids = np.array([a.id for a in agents if a.alive], dtype=np.intp)
+        self.slots = np.full(int(ids.max()) + 1 if len(ids) else 1, -1, dtype=np.intp)
+        self.slots[ids] = [i for i, a in enumerate(agents) if a.alive]
+        self.ids = np.array([a.id for a in agents], dtype=np.intp)
+        self.kill_intent = np.array([a.kill_intent for a in agents], dtype=np.float64)
+        self.alive_count = len(ids)
+        self.stats.begin(agents, self.brain)
+
+    # --- World ---
+    def populate_world(self):
+        self.grid.pheromones.fill(0)
+        self.grid.clear_agents()
+        self.set_agents(self.random_agents(self.spawn_locations()))
+
+    def random_agents(self, locs):
+        """Agents with fresh random genomes at locs, placed on the grid."""
+        genes = gen.make_random_genes(len(locs) * self.genome_len, self.rngs["genetics"])
+        agents = [Agent(x, y, genome=genome, agent_id=i+1)
+                  for i, ((x, y), genome) in enumerate(zip(locs, gen.split_genomes(genes, [self.genome_len] * len(locs))))]
+        self.place(agents)
+        return agents
+
+    def place(self, agents):
+        """Puts agents on their (free) grid cells in one go."""
+        if agents: self.grid.place_agents(*np.array([(a.x, a.y, a.id) for a in agents], dtype=np.intp).T)
+
+    def spawn_locations(self):
+        """Free cells for a full population, as a list of (x, y)."""
+        return self.grid.find_empty_locations(self.pop_size, avoid_safe=self.spawn_away, margin=5, rng=self.rngs["world"]).tolist()
+
+    def reset(self):
+        """Starts a fresh run from generation 1 on the current level."""
+        self.generation, self.time_step = 1, 0
+        self.stats.clear()
+        self.populate_world()
+        if self.checkpoint_log is not None: self.checkpoint_log.clear()
+        self.checkpoint()
+
+    def checkpoint(self):
+        """Appends the current (generation start) state to the checkpoint log, if due."""
+        if self.checkpoint_log is not None and (self.generation - 1) % self.checkpoint_every == 0:
+            self.checkpoint_log.append(self)
+
+    def spawn_next_generation(self):
+        # Only survivors (alive, on a safe tile) breed
+        xs, ys = self.positions()[:2]
+        rows = np.flatnonzero((self.slots[self.ids] >= 0) & self.grid.safe_zones[xs, ys])
+        survivors = [self.agents[i] for i in rows]
+        num_survivors = len(survivors)
+        self.last_survivors = num_survivors
+        self.stats.end(self.generation, len(self.agents), num_survivors, self.grid.pheromone_mass())
+        self.grid.clear_agents()
+        new_agents = []
+        locs = self.spawn_locations()
+        rng = self.rngs["genetics"]
+        if num_survivors == 0:
+            new_agents = self.random_agents(locs)
+        else:
+            # Breed the whole offspring population at once
+            parents = rng.randint(0, num_survivors, (len(locs), 2))
+            genomes = [a.genome for a in survivors]
+            flat, lengths = gen.crossover_population(genomes, parents[:, 0], parents[:, 1], unequal_rate=self.unequal_rate, rng=rng)
+            flat, lengths = gen.mutate_population(flat, lengths, mutation_rate=self.mutation_rate, insertion_rate=self.insertion_rate, deletion_rate=self.deletion_rate, rng=rng)
+            new_agents = [Agent(x, y, genome=child_genome, agent_id=i+1) for i, ((x, y), child_genome) in enumerate(zip(locs, gen.split_genomes(flat, lengths)))]
+            self.place(new_agents)
+        self.set_agents(new_agents)
+
+    def find_agent(self, agent_id):
+        """O(1) lookup of a living agent by id."""
+        if 0 < agent_id < len(self.slots):
+            slot = self.slots[agent_id]
+            if slot >= 0: return self.agents[slot]
+        return None
+
+    def kill(self, agent):
+        agent.alive = False
+        self.slots[agent.id] = -1
+        self.grid.clear(agent.x, agent.y)
+        self.alive_count -= 1
+        self.stats.kills += 1
+
+    def count_alive(self):
+        return self.alive_count
+
+    # --- Stepping ---
+    def positions(self):
+        """(xs, ys, last_dx, last_dy) int arrays, one entry per agent row."""
+        agents = self.agents
+        xs = np.array([a.x for a in agents], dtype=np.intp)
+        ys = np.array([a.y for a in agents], dtype=np.intp)
+        last = np.array([a.last_move for a in agents], dtype=np.intp).reshape(-1, 2)
+        return xs, ys, last[:, 0], last[:, 1]
+
+    def sense(self, alive=None, pos=None):
+        """Sensor matrix (agents x NUM_SENSORS) for the current step."""
+        xs, ys, last_dx, last_dy = pos if pos is not None else self.positions()
+        rows = self.brain.sensor_rows(alive, set(gen.ENABLED_SENSORS))
+        return compute_sensors(self.grid, xs, ys, last_dx, last_dy, self.time_step, rows, self.slots, self.kill_intent, self.rngs["behavior"])
+
+    def step(self):
+        """
+        Advances the world by one time step.
+        All brains are evaluated at once on the state at the start of the
+        step, then actions are applied in stages: emits, kills (in priority
+        order) and finally all moves at once (Grid.move_agents).
+        Returns True if this step finished a generation.
+        """
+        grid, agents, timer = self.grid, self.agents, self.timer
+        n = len(agents)
+        timer.start()
+        grid.update_pheromones(); timer.lap("pheromones")
+
+        pos = self.positions()
+        xs, ys = pos[0], pos[1]
+        alive = np.array([a.alive for a in agents], dtype=bool)
+        sensors = self.sense(alive, pos); timer.lap("sense")
+        levels = self.brain.think(sensors, alive)
+        move_x, move_y = np.tanh(levels[:, A_MOVE_X]), np.tanh(levels[:, A_MOVE_Y])
+        self.kill_intent = np.tanh(levels[:, A_KILL])
+        emit = np.tanh(levels[:, A_EMIT])
+        rng = self.rngs["behavior"]
+        dice = rng.random((n, 2))
+        dxs = np.where(dice[:, 0] < np.abs(move_x), np.sign(move_x), 0).astype(np.intp)
+        dys = np.where(dice[:, 1] < np.abs(move_y), np.sign(move_y), 0).astype(np.intp)
+        # Random priority: the order in which agents would act one by one
+        priority = rng.permutation(n); timer.lap("think")
+
+        # 1. Emit
+        emitting = alive & (emit > 0)
+        amounts = emit[emitting] * 0.5
+        grid.add_pheromones(xs[emitting], ys[emitting], amounts)
+        self.stats.emitted += float(amounts.sum()); timer.lap("emit")
+
+        # 2. Kill (rare, so resolved one by one in priority order)
+        if self.enabled_traits["Kill"]:
+            for i in np.flatnonzero(alive).tolist(): agents[i].kill_intent = float(self.kill_intent[i])
+            killers = np.flatnonzero(alive & (self.kill_intent > 0.5))
+            for i in killers[np.argsort(priority[killers])].tolist():
+                agent = agents[i]
+                if not agent.alive: continue
+                # Target cell ahead
+                fdx, fdy = agent.last_move
+                if fdx == 0 and fdy == 0: fdx = 1 # Default forward
+                tx, ty = agent.x + fdx, agent.y + fdy
+                if 0 <= tx < grid.size and 0 <= ty < grid.size:
+                    target_id = grid.data[tx, ty]
+                    if target_id > 0: # It's an agent
+                        victim = self.find_agent(target_id)
+                        if victim: alive[self.slots[target_id]] = False; self.kill(victim)
+            timer.lap("kill")
+
+        # 3. Move: all proposed moves resolved at once
+        dxs[~alive], dys[~alive] = 0, 0
+        moved = np.flatnonzero(grid.move_agents(xs, ys, dxs, dys, self.ids, self.slots, priority))
+        for i, x, y, dx, dy in zip(moved.tolist(), (xs[moved] + dxs[moved]).tolist(), (ys[moved] + dys[moved]).tolist(),
+                                   dxs[moved].tolist(), dys[moved].tolist()):
+            agent = agents[i]; agent.x, agent.y, agent.last_move = x, y, (dx, dy)
+        timer.lap("move")
+        if self.recorder is not None:
+            xs[moved] += dxs[moved]; ys[moved] += dys[moved]
+            self.recorder.record(self, xs, ys, alive, levels); timer.lap("record")
+
+        self.time_step += 1
+        if self.time_step >= self.steps_per_gen:
+            self.spawn_next_generation(); self.time_step, self.generation = 0, self.generation + 1
+            self.checkpoint(); timer.lap("spawn")
+            return True
+        return False
+
+    def run_generation(self):
+        """Runs until the current generation ends. Returns the number of survivors."""
+        while not self.step(): pass
+        return self.last_survivors
+
+    def run(self, n_generations, callback=None):
+        """
+        Runs n_generations full generations.
+        callback(generation, survivors) is called after each one.
+        """
+        for _ in range(n_generations):
+            gen_num = self.generation
+            survivors = self.run_generation()
+            if callback: callback(gen_num, survivors)
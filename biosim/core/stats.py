@@ -0,0 +1,81 @@
+import csv
+import numpy as np
+from biosim.core.constants import MAX_NEURONS, NUM_SENSORS, NUM_ACTIONS, SENSOR_NAMES, ACTION_NAMES
+
+# One row per finished generation. sensors/actions: fraction of the
+# population whose brain reads each sensor / drives each action.
+STATS_DTYPE = np.dtype([
+    ("generation", np.int64), ("population", np.int32), ("survivors", np.int32), ("rate", np.float32),
+    ("kills", np.int32), ("genome_len", np.float32), ("emitted", np.float32), ("pheromone", np.float32),
+    ("sensors", np.float32, (NUM_SENSORS,)), ("actions", np.float32, (NUM_ACTIONS,)),
+])
+STATS_COLUMNS = ([name for name in STATS_DTYPE.names if name not in ("sensors", "actions")]
+                 + [f"sensor_{SENSOR_NAMES[i]}" for i in range(NUM_SENSORS)] + [f"action_{ACTION_NAMES[i]}" for i in range(NUM_ACTIONS)])
+
+class GenerationStats:
+    """
+    Per-generation population metrics in a fixed-size ring buffer, so memory
+    stays flat however long the run. The Simulation feeds the generation in
+    progress as it goes: begin() when a population is set (genome length,
+    sensor/action usage), kills and emitted pheromone during steps, and
+    end() commits the row when the generation finishes.
+    """
+    def __init__(self, capacity=4096):
+        self.rows = np.zeros(capacity, dtype=STATS_DTYPE)
+        self.count = 0 # rows ever committed; row k lives at k % capacity
+        self.begin([], None)
+
+    def clear(self):
+        self.count = 0
+
+    def begin(self, agents, brain):
+        n = len(agents)
+        self.kills, self.emitted = 0, 0.0
+        self.genome_len = float(np.mean([len(a.genome) for a in agents])) if n else 0.0
+        self.sensors, self.actions = np.zeros(NUM_SENSORS), np.zeros(NUM_ACTIONS)
+        if n:
+            self.sensors = np.array([len(users) for users in brain.sensor_users]) / n
+            self.actions = (brain.sink[:, :, None] == MAX_NEURONS + np.arange(NUM_ACTIONS)).any(axis=1).mean(axis=0)
+
+    def end(self, generation, population, survivors, pheromone):
+        self.rows[self.count % len(self.rows)] = (generation, population, survivors, survivors / population if population else 0.0,
+                                                  self.kills, self.genome_len, self.emitted, pheromone, self.sensors, self.actions)
+        self.count += 1
+
+    def __len__(self):
+        return min(self.count, len(self.rows))
+
+    def latest(self, n=None):
+        """The last n (default: all kept) rows, oldest first."""
+        n = len(self) if n is None else min(n, len(self))
+        return self.rows[np.arange(self.count - n, self.count) % len(self.rows)]
+
+class StatsWriter:
+    """
+    Streams committed GenerationStats rows to a CSV file in batches of
+    `batch` generations. The ring buffer must hold at least one batch.
+    """
+    def __init__(self, filename, stats, batch=100):
+        if batch > len(stats.rows): raise ValueError(f"Batch of {batch} exceeds the stats capacity ({len(stats.rows)})")
+        self.stats, self.batch = stats, batch
+        self.written = stats.count
+        self.file = open(filename, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(STATS_COLUMNS)
+
+    def update(self):
+        """Call after each generation; writes once a batch is complete."""
+        if self.stats.count - self.written >= self.batch: self.flush()
+
+    def flush(self):
+        rows = self.stats.latest(self.stats.count - self.written)
+        for r in rows:
+            self.writer.writerow([int(r["generation"]), int(r["population"]), int(r["survivors"]), f"{r['rate']:.4f}", int(r["kills"]),
+                                  f"{r['genome_len']:.3f}", f"{r['emitted']:.3f}", f"{r['pheromone']:.3f}"]
+                                 + [f"{v:.4f}" for v in r["sensors"]] + [f"{v:.4f}" for v in r["actions"]])
+        self.file.flush()
+        self.written = self.stats.count
+
+    def close(self):
+        self.flush()
+        self.file.close()
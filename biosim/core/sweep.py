@@ -0,0 +1,60 @@
+import csv
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from biosim.core.simulation import Simulation
+
+# Params that can be swept (same keys as App.perform_save)
+SWEEP_KEYS = ("mut", "ins", "del", "uneq", "pop", "glen", "steps", "size", "traits")
+RESULT_FIELDS = ["cell", "repeat", "seed"] + list(SWEEP_KEYS) + ["generation", "survivors", "rate"]
+
+def expand_grid(grid):
+    """{key: [values, ...]} -> list of override dicts, one per combination."""
+    for key in grid:
+        if key not in SWEEP_KEYS: raise ValueError(f"Unknown sweep parameter: {key}")
+    keys = list(grid)
+    return [dict(zip(keys, combo)) for combo in itertools.product(*(grid[k] for k in keys))]
+
+def cell_seed(base_seed, cell, repeat, repeats):
+    return base_seed + cell * repeats + repeat
+
+def run_cell(grid, params, overrides, generations, seed, brain_cache=None):
+    """
+    Runs one sweep cell from generation 1 on a copy of the level.
+    Returns (final params, survivors per generation).
+    """
+    sim = Simulation(grid.size, seed=seed, brain_cache=brain_cache)
+    sim.load_state(grid, [], params)
+    sim.update_params(overrides)
+    sim.reset()
+    survivors = []
+    sim.run(generations, callback=lambda g, s: survivors.append(s))
+    return sim.get_params(), survivors
+
+def run_sweep(grid, params, cells, generations, out_file, repeats=1, base_seed=0, workers=None, only=None, progress=None,
+              brain_cache=None):
+    """
+    Fans every (cell, repeat) out over a process pool and streams one CSV row
+    per generation into out_file. Each run is seeded with
+    cell_seed(base_seed, cell, repeat, repeats), so any cell can be rerun alone
+    (only=cell) and gives the same rows. brain_cache bounds each worker's
+    compiled-brain cache (entries).
+    """
+    jobs = [(c, r) for c in range(len(cells)) for r in range(repeats) if only is None or c == only]
+    with open(out_file, 'w', newline='') as f, ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        futures = {pool.submit(run_cell, grid, params, cells[c], generations, cell_seed(base_seed, c, r, repeats), brain_cache): (c, r)
+                   for c, r in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            c, r = futures[future]
+            final, survivors = future.result()
+            row = {k: final[k] for k in SWEEP_KEYS}
+            row["traits"] = json.dumps(final["traits"], sort_keys=True)
+            for generation, count in enumerate(survivors, 1):
+                writer.writerow({"cell": c, "repeat": r, "seed": cell_seed(base_seed, c, r, repeats), **row,
+                                 "generation": generation, "survivors": count,
+                                 "rate": count / final["pop"] if final["pop"] else 0.0})
+            f.flush()
+            if progress: progress(done, len(jobs), c, r)
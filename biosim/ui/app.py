@@ -1,17 +1,20 @@
+import copy
 import sys
-import random
+import time
+import numpy as np
 import pygame
 import os
-import numpy as np
-import math
 
 from biosim.core.constants import *
-from biosim.core.grid import Grid, is_safe
-from biosim.core.agent import Agent
+from biosim.core.grid import Grid
+from biosim.core.simulation import Simulation
 import biosim.core.genome as gen
 from biosim.core.persistence import save_simulation, load_simulation
 from biosim.ui.widgets import Button, Slider
-from biosim.ui.rendering import draw_brain
+from biosim.core.profiler import PhaseTimer, profile_delta
+from biosim.ui.rendering import BrainView, WorldRenderer, draw_profile, draw_stats
+from biosim.ui.runner import SimulationRunner
+from biosim.ui.viewport import Viewport
 
 # Config
 PANEL_WIDTH = 300
@@ -22,10 +25,10 @@ BOTTOM_BAR_HEIGHT = 50
 WINDOW_WIDTH = PANEL_WIDTH + SIM_WIDTH
 WINDOW_HEIGHT = SIM_HEIGHT + BOTTOM_BAR_HEIGHT
 
-GRID_SIZE = 128
-CELL_SIZE = min((SIM_WIDTH - 20) // GRID_SIZE, (SIM_HEIGHT - 20) // GRID_SIZE)
-SIM_OFFSET_X = PANEL_WIDTH + (SIM_WIDTH - (GRID_SIZE * CELL_SIZE)) // 2
-SIM_OFFSET_Y = (SIM_HEIGHT - (GRID_SIZE * CELL_SIZE)) // 2
+GRID_SIZE = 128 # size of a new world; levels carry their own
+GRID_SIZE_RANGE = (16, 4096)
+SIM_RECT = (PANEL_WIDTH + 10, 10, SIM_WIDTH - 20, SIM_HEIGHT - 20)
+ZOOM_STEP = 1.25 # per mouse wheel notch
 
 # Colors
 COLOR_BG = (20, 20, 20)
@@ -50,49 +53,29 @@ class App:
         self.tool_mode = 0
         self.paused = False
         self.hide_dead_nodes = False
-        self.spawn_away = False
-        
-        # Params
-        self.mutation_rate = 0.01
-        self.insertion_rate = 0.01
-        self.deletion_rate = 0.01
-        self.unequal_rate = 0.0 
         self.brush_size = 1
-        self.pop_size = 1000
-        self.genome_len = 12
-        self.steps_per_gen = 300
-        
-        self.enabled_traits = {"Vision": True, "Smell": True, "Osc": True, "Mem": True, "Emit": True, "Kill": False}
-        self.sync_genetic_config()
-        
-        self.grid = Grid(GRID_SIZE)
-        self.agents = []
+        self.sim = Simulation(GRID_SIZE)
         self.selected_agent = None
-        self.generation = 1
-        self.step = 0
+        self.world_renderer = WorldRenderer(COLOR_SAFE_ZONE, COLOR_BARRIER)
+        self.viewport = Viewport(pygame.Rect(SIM_RECT), GRID_SIZE)
+        self.panning = False
+        self.brain_view = BrainView()
+        self.runner = SimulationRunner(self.sim)
+        self.shown_agents = self.sim.agents
+        # Profiling: UI phases are timed here, simulation phases by sim.timer
+        self.ui_timer = PhaseTimer()
+        self.profiling = False
+        self.profile_rows, self.profile_mark = [], None
         
         self.init_ui()
 
-    def sync_genetic_config(self):
-        sensors = [S_LOC_X, S_LOC_Y, S_RANDOM]
-        if self.enabled_traits["Vision"]: sensors += SENSOR_GROUPS["Vision"]
-        if self.enabled_traits["Smell"]: sensors += SENSOR_GROUPS["Smell"]
-        if self.enabled_traits["Osc"]: sensors += SENSOR_GROUPS["Osc"]
-        if self.enabled_traits["Mem"]: sensors += SENSOR_GROUPS["Mem"]
-        if self.enabled_traits["Kill"]: sensors += SENSOR_GROUPS["Danger"]
-        gen.ENABLED_SENSORS = sorted(list(set(sensors)))
-        
-        actions = [A_MOVE_X, A_MOVE_Y, A_MOVE_FWD]
-        if self.enabled_traits["Emit"]: actions += ACTION_GROUPS["Emit"]
-        if self.enabled_traits["Kill"]: actions += ACTION_GROUPS["Kill"]
-        gen.ENABLED_ACTIONS = sorted(list(set(actions)))
-
     def init_ui(self):
         self.btn_start = Button(20, 20, 90, 30, "Start", self.toggle_run)
         self.btn_pause = Button(120, 20, 60, 30, "Pause", self.toggle_pause)
         self.btn_clear = Button(190, 20, 60, 30, "Clear", self.clear_grid)
-        self.btn_save = Button(20, 60, 125, 30, "Save", self.prompt_save)
-        self.btn_load = Button(155, 60, 125, 30, "Load", self.prompt_load)
+        self.btn_save = Button(20, 60, 80, 30, "Save", self.prompt_save)
+        self.btn_load = Button(110, 60, 80, 30, "Load", self.prompt_load)
+        self.btn_size = Button(200, 60, 80, 30, "Size", self.prompt_size)
         y_tool = 100
         self.btn_tool_sel = Button(20, y_tool, 60, 30, "Sel", lambda: self.set_tool(0))
         self.btn_tool_bar = Button(90, y_tool, 60, 30, "Wall", lambda: self.set_tool(1))
@@ -111,106 +94,98 @@ class App:
         y_slide = 175
         gap = 33
         self.sliders = [
-            Slider(20, y_slide, 210, 12, 0.0, 0.1, self.mutation_rate, "Mut Rate", self.set_mut_rate),
-            Slider(20, y_slide+gap, 210, 12, 0.0, 0.1, self.insertion_rate, "Ins Rate", self.set_ins_rate),
-            Slider(20, y_slide+gap*2, 210, 12, 0.0, 0.1, self.deletion_rate, "Del Rate", self.set_del_rate),
-            Slider(20, y_slide+gap*3, 210, 12, 0.0, 1.0, self.unequal_rate, "Unequal %", self.set_unequal_rate),
+            Slider(20, y_slide, 210, 12, 0.0, 0.1, self.sim.mutation_rate, "Mut Rate", self.set_mut_rate),
+            Slider(20, y_slide+gap, 210, 12, 0.0, 0.1, self.sim.insertion_rate, "Ins Rate", self.set_ins_rate),
+            Slider(20, y_slide+gap*2, 210, 12, 0.0, 0.1, self.sim.deletion_rate, "Del Rate", self.set_del_rate),
+            Slider(20, y_slide+gap*3, 210, 12, 0.0, 1.0, self.sim.unequal_rate, "Unequal %", self.set_unequal_rate),
             Slider(20, y_slide+gap*4, 210, 12, 1, 5, self.brush_size, "Brush Size", self.set_brush_size, int_mode=True),
-            Slider(20, y_slide+gap*5, 210, 12, 100, 5000, self.pop_size, "Pop Size", self.set_pop_size, int_mode=True),
-            Slider(20, y_slide+gap*6, 210, 12, 4, 32, self.genome_len, "Genome Len", self.set_genome_len, int_mode=True),
-            Slider(20, y_slide+gap*7, 210, 12, 100, 2000, self.steps_per_gen, "Steps/Gen", self.set_steps, int_mode=True)
+            Slider(20, y_slide+gap*5, 210, 12, 100, 5000, self.sim.pop_size, "Pop Size", self.set_pop_size, int_mode=True),
+            Slider(20, y_slide+gap*6, 210, 12, 4, 32, self.sim.genome_len, "Genome Len", self.set_genome_len, int_mode=True),
+            Slider(20, y_slide+gap*7, 210, 12, 100, 2000, self.sim.steps_per_gen, "Steps/Gen", self.set_steps, int_mode=True)
         ]
         
         self.btn_prune = Button(130, SIM_HEIGHT - 330, 150, 25, "Hide Dead Nodes", self.toggle_prune)
         self.btn_spawn_away = Button(20, SIM_HEIGHT - 330, 100, 25, "Spawn Away", self.toggle_spawn_away)
+        self.btn_speed = Button(20, 495, 175, 20, "Speed: sync", self.runner.cycle_mode)
+        self.btn_profile = Button(205, 495, 75, 20, "Profile", self.toggle_profile)
         
-        self.buttons = [self.btn_start, self.btn_pause, self.btn_clear, self.btn_save, self.btn_load,
+        self.buttons = [self.btn_start, self.btn_pause, self.btn_clear, self.btn_save, self.btn_load, self.btn_size,
                         self.btn_tool_sel, self.btn_tool_bar, self.btn_tool_saf, self.btn_tool_era,
                         self.btn_tog_vis, self.btn_tog_sml, self.btn_tog_osc, self.btn_tog_mem, self.btn_tog_emt, self.btn_tog_kil,
-                        self.btn_prune, self.btn_spawn_away]
+                        self.btn_prune, self.btn_spawn_away, self.btn_speed, self.btn_profile]
 
-    def toggle_trait(self, trait): self.enabled_traits[trait] = not self.enabled_traits[trait]; self.sync_genetic_config()
+    def toggle_trait(self, trait): self.sim.enabled_traits[trait] = not self.sim.enabled_traits[trait]; self.sim.sync_genetic_config()
     def toggle_prune(self): self.hide_dead_nodes = not self.hide_dead_nodes
-    def toggle_spawn_away(self): self.spawn_away = not self.spawn_away
+    def toggle_spawn_away(self): self.sim.spawn_away = not self.sim.spawn_away
+    def toggle_profile(self):
+        self.profiling = not self.profiling
+        self.sim.timer.enabled = self.ui_timer.enabled = self.profiling
+        self.profile_rows, self.profile_mark = [], None
+
+    def update_profile(self):
+        """Rolling per-phase breakdown over the last half second."""
+        now = time.perf_counter()
+        snap = (self.sim.timer.snapshot(), self.ui_timer.snapshot())
+        if self.profile_mark is None: self.profile_mark = (now, snap)
+        elif now - self.profile_mark[0] >= 0.5:
+            prev = self.profile_mark[1]
+            self.profile_rows = [("Simulation (ms/step)", profile_delta(prev[0], snap[0])), ("UI (ms/frame)", profile_delta(prev[1], snap[1]))]
+            self.profile_mark = (now, snap)
 
     def prompt_save(self): self.input_mode, self.input_text = "SAVE", "level.json"
     def prompt_load(self): self.input_mode, self.input_text = "LOAD", "level.json"
+    def prompt_size(self): self.input_mode, self.input_text = "SIZE", str(self.sim.grid.size)
 
     def perform_save(self):
-        params = {"gen": self.generation, "step": self.step, "mut": self.mutation_rate, "ins": self.insertion_rate,
-                  "del": self.deletion_rate, "uneq": self.unequal_rate, "pop": self.pop_size, "glen": self.genome_len,
-                  "steps": self.steps_per_gen, "traits": self.enabled_traits, "spawn_away": self.spawn_away}
-        save_simulation(self.input_text, self.grid, self.agents, params); self.input_mode = None
+        save_simulation(self.input_text, self.sim.grid, self.sim.agents, self.sim.get_params()); self.input_mode = None
 
     def perform_load(self):
         res = load_simulation(self.input_text)
         if res:
-            self.grid, self.agents, params = res
-            self.generation, self.step = params.get("gen", 1), params.get("step", 0)
-            self.mutation_rate, self.insertion_rate = params.get("mut", 0.01), params.get("ins", 0.01)
-            self.deletion_rate, self.unequal_rate = params.get("del", 0.01), params.get("uneq", 0.0)
-            self.pop_size, self.genome_len, self.steps_per_gen = params.get("pop", 1000), params.get("glen", 12), params.get("steps", 300)
-            self.spawn_away = params.get("spawn_away", False)
-            self.enabled_traits = params.get("traits", self.enabled_traits); self.sync_genetic_config()
-            for i, p in enumerate([self.mutation_rate, self.insertion_rate, self.deletion_rate, self.unequal_rate]): self.sliders[i].value = p
-            self.sliders[5].value, self.sliders[6].value, self.sliders[7].value = self.pop_size, self.genome_len, self.steps_per_gen
+            sim = self.sim
+            sim.load_state(*res)
+            for i, p in enumerate([sim.mutation_rate, sim.insertion_rate, sim.deletion_rate, sim.unequal_rate]): self.sliders[i].value = p
+            self.sliders[5].value, self.sliders[6].value, self.sliders[7].value = sim.pop_size, sim.genome_len, sim.steps_per_gen
             self.sim_state, self.paused, self.selected_agent = "RUN", True, None
         self.input_mode = None
 
+    def perform_resize(self):
+        # Resizing keeps the level where it fits but drops the population
+        size = int(self.input_text) if self.input_text.isdigit() else 0
+        if GRID_SIZE_RANGE[0] <= size <= GRID_SIZE_RANGE[1]:
+            self.sim.resize(size)
+            self.sim_state, self.selected_agent = "EDIT", None
+        else: print(f"World size must be between {GRID_SIZE_RANGE[0]} and {GRID_SIZE_RANGE[1]}")
+        self.input_mode = None
+
     def toggle_run(self):
-        if self.sim_state == "EDIT": self.sim_state, self.generation, self.step = "RUN", 1, 0; self.populate_world()
-        else: self.sim_state, self.agents = "EDIT", []
+        if self.sim_state == "EDIT": self.sim_state = "RUN"; self.sim.reset()
+        else: self.sim_state = "EDIT"; self.sim.set_agents([])
     def toggle_pause(self): self.paused = not self.paused
-    def clear_grid(self): self.grid, self.agents, self.selected_agent = Grid(GRID_SIZE), [], None
+    def clear_grid(self): self.sim.grid, self.selected_agent = Grid(self.sim.grid.size), None; self.sim.set_agents([])
     def set_tool(self, mode): self.tool_mode = mode
-    def set_mut_rate(self, val): self.mutation_rate = val
-    def set_ins_rate(self, val): self.insertion_rate = val
-    def set_del_rate(self, val): self.deletion_rate = val
-    def set_unequal_rate(self, val): self.unequal_rate = val
+    def set_mut_rate(self, val): self.sim.mutation_rate = val
+    def set_ins_rate(self, val): self.sim.insertion_rate = val
+    def set_del_rate(self, val): self.sim.deletion_rate = val
+    def set_unequal_rate(self, val): self.sim.unequal_rate = val
     def set_brush_size(self, val): self.brush_size = int(val)
-    def set_pop_size(self, val): self.pop_size = int(val)
-    def set_genome_len(self, val): self.genome_len = int(val)
-    def set_steps(self, val): self.steps_per_gen = int(val)
-
-    def populate_world(self):
-        self.agents = []
-        self.grid.pheromones.fill(0)
-        for x in range(GRID_SIZE):
-            for y in range(GRID_SIZE):
-                if not self.grid.is_barrier(x, y): self.grid.set(x, y, 0)
-        for i in range(self.pop_size):
-            loc = self.grid.find_empty_location(avoid_safe=self.spawn_away, margin=5)
-            if loc: x, y = loc; self.agents.append(Agent(x, y, genome_length=self.genome_len, agent_id=i+1)); self.grid.set(x, y, i+1)
-
-    def spawn_next_generation(self):
-        # Only survivors breed
-        survivors = [a for a in self.agents if a.alive and is_safe(a, self.grid)]
-        num_survivors = len(survivors)
-        for x in range(GRID_SIZE):
-            for y in range(GRID_SIZE):
-                if not self.grid.is_barrier(x, y): self.grid.set(x, y, 0)
-        new_agents = []
-        if num_survivors == 0:
-            for i in range(self.pop_size):
-                loc = self.grid.find_empty_location(avoid_safe=self.spawn_away, margin=5)
-                if loc: x, y = loc; new_agents.append(Agent(x, y, genome_length=self.genome_len, agent_id=i+1)); self.grid.set(x, y, i+1)
-        else:
-            for i in range(self.pop_size):
-                p1, p2 = random.choice(survivors), random.choice(survivors)
-                child_genome = gen.crossover_genomes(p1.genome, p2.genome, unequal_rate=self.unequal_rate)
-                gen.mutate_genome(child_genome, mutation_rate=self.mutation_rate, insertion_rate=self.insertion_rate, deletion_rate=self.deletion_rate)
-                loc = self.grid.find_empty_location(avoid_safe=self.spawn_away, margin=5)
-                if loc: x, y = loc; new_agents.append(Agent(x, y, genome=child_genome, agent_id=i+1)); self.grid.set(x, y, i+1)
-        self.agents, self.selected_agent = new_agents, None
+    def set_pop_size(self, val): self.sim.pop_size = int(val)
+    def set_genome_len(self, val): self.sim.genome_len = int(val)
+    def set_steps(self, val): self.sim.steps_per_gen = int(val)
 
     def run(self):
         running, mouse_down = True, False
         while running:
+            # The simulation steps on the runner's thread; hold its lock only
+            # while handling input and copying what the frame shows, so both
+            # see whole steps, and draw from the copy after releasing it
+            self.ui_timer.start()
+            self.runner.lock.acquire(); self.ui_timer.lap("lock_wait")
             for event in pygame.event.get():
                 if event.type == pygame.QUIT: running = False
                 if self.input_mode:
                     if event.type == pygame.KEYDOWN:
-                        if event.key == pygame.K_RETURN: self.perform_save() if self.input_mode == "SAVE" else self.perform_load()
+                        if event.key == pygame.K_RETURN: {"SAVE": self.perform_save, "LOAD": self.perform_load, "SIZE": self.perform_resize}[self.input_mode]()
                         elif event.key == pygame.K_BACKSPACE: self.input_text = self.input_text[:-1]
                         elif event.key == pygame.K_ESCAPE: self.input_mode = None
                         else: self.input_text += event.unicode
@@ -218,95 +193,85 @@ class App:
                 self.btn_start.text = "Stop" if self.sim_state == "RUN" else "Start"; self.btn_pause.toggled = self.paused
                 self.btn_tool_sel.toggled = (self.tool_mode == 0); self.btn_tool_bar.toggled = (self.tool_mode == 1)
                 self.btn_tool_saf.toggled = (self.tool_mode == 2); self.btn_tool_era.toggled = (self.tool_mode == 3)
-                self.btn_tog_vis.toggled, self.btn_tog_sml.toggled = self.enabled_traits["Vision"], self.enabled_traits["Smell"]
-                self.btn_tog_osc.toggled, self.btn_tog_mem.toggled, self.btn_tog_emt.toggled, self.btn_tog_kil.toggled = self.enabled_traits["Osc"], self.enabled_traits["Mem"], self.enabled_traits["Emit"], self.enabled_traits["Kill"]
-                self.btn_prune.toggled, self.btn_spawn_away.toggled = self.hide_dead_nodes, self.spawn_away
+                self.btn_tog_vis.toggled, self.btn_tog_sml.toggled = self.sim.enabled_traits["Vision"], self.sim.enabled_traits["Smell"]
+                self.btn_tog_osc.toggled, self.btn_tog_mem.toggled, self.btn_tog_emt.toggled, self.btn_tog_kil.toggled = self.sim.enabled_traits["Osc"], self.sim.enabled_traits["Mem"], self.sim.enabled_traits["Emit"], self.sim.enabled_traits["Kill"]
+                self.btn_prune.toggled, self.btn_spawn_away.toggled = self.hide_dead_nodes, self.sim.spawn_away
                 for btn in self.buttons: btn.handle_event(event)
                 for sld in self.sliders: sld.handle_event(event)
                 if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1: mouse_down = True
                 elif event.type == pygame.MOUSEBUTTONUP: mouse_down = False
+                # Viewport: wheel zooms at the cursor, right/middle drag pans, Home shows the whole world
+                if event.type == pygame.MOUSEWHEEL and self.viewport.rect.collidepoint(pygame.mouse.get_pos()): self.viewport.zoom_at(*pygame.mouse.get_pos(), ZOOM_STEP ** event.y)
+                elif event.type == pygame.MOUSEBUTTONDOWN and event.button in (2, 3) and self.viewport.rect.collidepoint(event.pos): self.panning = True
+                elif event.type == pygame.MOUSEBUTTONUP and event.button in (2, 3): self.panning = False
+                elif event.type == pygame.MOUSEMOTION and self.panning: self.viewport.pan(*event.rel)
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_HOME: self.viewport.reset(self.sim.grid.size)
 
+            grid_size = self.sim.grid.size
+            if grid_size != self.viewport.world: self.viewport.reset(grid_size)
             if not self.input_mode:
-                mx, my = pygame.mouse.get_pos()
-                gx, gy = (mx - SIM_OFFSET_X) // CELL_SIZE if mx > PANEL_WIDTH and my < SIM_HEIGHT else -1, (my - SIM_OFFSET_Y) // CELL_SIZE if mx > PANEL_WIDTH and my < SIM_HEIGHT else -1
+                gx, gy = self.viewport.to_cell(*pygame.mouse.get_pos()) or (-1, -1)
                 if mouse_down and gx != -1:
                     if self.sim_state == "EDIT" and self.tool_mode != 0:
                         r = self.brush_size - 1
                         for bx in range(gx - r, gx + r + 1):
                             for by in range(gy - r, gy + r + 1):
-                                if 0 <= bx < GRID_SIZE and 0 <= by < GRID_SIZE:
-                                    if self.tool_mode == 1: self.grid.set(bx, by, BARRIER)
-                                    elif self.tool_mode == 2: self.grid.set_safe(bx, by, True)
-                                    elif self.tool_mode == 3: self.grid.set(bx, by, 0); self.grid.set_safe(bx, by, False)
-                    if self.tool_mode == 0 and 0 <= gx < GRID_SIZE and 0 <= gy < GRID_SIZE:
-                        agent_id = self.grid.data[gx][gy]
-                        if agent_id > 0:
-                            for a in self.agents:
-                                if a.id == agent_id: self.selected_agent = a; break
-                        else: self.selected_agent = None
-                if self.sim_state == "RUN" and not self.paused:
-                    self.grid.update_pheromones(); random.shuffle(self.agents)
-                    for agent in self.agents:
-                        if not agent.alive: continue
-                        dx, dy, action_levels = agent.think(self.grid, self.step)
-                        
-                        # Handle Killing
-                        if self.enabled_traits["Kill"]:
-                            kill_val = math.tanh(action_levels[A_KILL])
-                            if kill_val > 0.5:
-                                # Target cell ahead
-                                fdx, fdy = agent.last_move
-                                if fdx == 0 and fdy == 0: fdx = 1 # Default forward
-                                tx, ty = agent.x + fdx, agent.y + fdy
-                                if 0 <= tx < GRID_SIZE and 0 <= ty < GRID_SIZE:
-                                    target_id = self.grid.data[tx][ty]
-                                    if target_id > 0: # It's an agent
-                                        for victim in self.agents:
-                                            if victim.id == target_id:
-                                                victim.alive = False
-                                                self.grid.clear(tx, ty)
-                                                break
-                        
-                        # Handle Movement
-                        if dx != 0 or dy != 0:
-                            nx, ny = agent.x + dx, agent.y + dy
-                            if 0 <= nx < GRID_SIZE and 0 <= ny < GRID_SIZE and self.grid.is_empty(nx, ny):
-                                self.grid.clear(agent.x, agent.y); agent.x, agent.y = nx, ny; self.grid.set(nx, ny, agent.id); agent.last_move = (dx, dy)
-                    self.step += 1
-                    if self.step >= self.steps_per_gen: self.spawn_next_generation(); self.step, self.generation, self.selected_agent = 0, self.generation + 1, None
+                                if 0 <= bx < grid_size and 0 <= by < grid_size:
+                                    if self.tool_mode == 1: self.sim.grid.set(bx, by, BARRIER)
+                                    elif self.tool_mode == 2: self.sim.grid.set_safe(bx, by, True)
+                                    elif self.tool_mode == 3: self.sim.grid.set(bx, by, 0); self.sim.grid.set_safe(bx, by, False)
+                    if self.tool_mode == 0:
+                        agent_id = self.sim.grid.data[gx, gy]
+                        self.selected_agent = self.sim.find_agent(agent_id) if agent_id > 0 else None
+            self.runner.active = self.sim_state == "RUN" and not self.paused and not self.input_mode
+            # A new generation replaces every agent
+            if self.sim.agents is not self.shown_agents: self.shown_agents, self.selected_agent = self.sim.agents, None
+            self.ui_timer.lap("input")
+
+            # Snapshot: the world window, the panel numbers and the selected agent
+            view = self.viewport
+            world = self.world_renderer.compose(self.sim, view)
+            status = [f"Gen: {self.sim.generation}  Step: {self.sim.time_step}  ({self.runner.steps_per_sec:.0f}/s)", f"Pop: {self.sim.count_alive()}  FPS: {self.clock.get_fps():.1f}"]
+            if self.profiling: self.update_profile()
+            stats_rows = self.sim.stats.latest(PANEL_WIDTH) if self.selected_agent is None else None
+            selected = None
+            if self.selected_agent:
+                selected = copy.copy(self.selected_agent); selected.neurons = np.array(self.selected_agent.neurons)
+            self.runner.lock.release(); self.ui_timer.lap("snapshot")
 
             self.screen.fill(COLOR_BG); pygame.draw.rect(self.screen, COLOR_PANEL, (0, 0, PANEL_WIDTH, SIM_HEIGHT)); pygame.draw.line(self.screen, (100, 100, 100), (PANEL_WIDTH, 0), (PANEL_WIDTH, WINDOW_HEIGHT))
             for btn in self.buttons: btn.draw(self.screen, self.font)
             for sld in self.sliders: sld.draw(self.screen, self.font)
-            for i, line in enumerate([f"Gen: {self.generation}  Step: {self.step}", f"Pop: {len([a for a in self.agents if a.alive])}  FPS: {self.clock.get_fps():.1f}"]):
+            self.btn_speed.text = f"Speed: {self.runner.mode}" + (f" x{self.runner.steps_per_frame}" if self.runner.mode == "adaptive" else "")
+            self.btn_profile.toggled = self.profiling
+            for i, line in enumerate(status):
                 self.screen.blit(self.font.render(line, True, COLOR_TEXT), (20, 450 + i*20))
-            draw_brain(self.screen, self.selected_agent, pygame.Rect(10, SIM_HEIGHT - 300, PANEL_WIDTH - 20, 290), self.small_font, pygame.mouse.get_pos(), hide_dead=self.hide_dead_nodes)
-            if self.selected_agent: self.screen.blit(self.font.render(f"ID: {self.selected_agent.id} {'(DEAD)' if not self.selected_agent.alive else ''}", True, COLOR_HIGHLIGHT), (20, SIM_HEIGHT - 320))
+            self.ui_timer.lap("panel")
+            if self.profiling:
+                draw_profile(self.screen, pygame.Rect(10, SIM_HEIGHT - 300, PANEL_WIDTH - 20, 290), self.small_font, self.profile_rows)
+            elif selected is None:
+                draw_stats(self.screen, pygame.Rect(10, SIM_HEIGHT - 300, PANEL_WIDTH - 20, 290), self.small_font, stats_rows)
+            else:
+                self.brain_view.draw(self.screen, selected, pygame.Rect(10, SIM_HEIGHT - 300, PANEL_WIDTH - 20, 290), self.small_font, pygame.mouse.get_pos(), hide_dead=self.hide_dead_nodes)
+            self.ui_timer.lap("brain_view")
+            if selected: self.screen.blit(self.font.render(f"ID: {selected.id} {'(DEAD)' if not selected.alive else ''}", True, COLOR_HIGHLIGHT), (20, SIM_HEIGHT - 320))
             
-            sim_rect = pygame.Rect(SIM_OFFSET_X, SIM_OFFSET_Y, GRID_SIZE*CELL_SIZE, GRID_SIZE*CELL_SIZE); pygame.draw.rect(self.screen, (0, 0, 0), sim_rect)
-            ph_view = (self.grid.pheromones * 255).astype(np.uint8)
-            for x in range(GRID_SIZE):
-                for y in range(GRID_SIZE):
-                    val = ph_view[x, y]
-                    if val > 10: pygame.draw.rect(self.screen, (0, 0, val), (SIM_OFFSET_X + x * CELL_SIZE, SIM_OFFSET_Y + y * CELL_SIZE, CELL_SIZE, CELL_SIZE))
-                    if self.grid.is_safe_tile(x, y): pygame.draw.rect(self.screen, COLOR_SAFE_ZONE, (SIM_OFFSET_X + x * CELL_SIZE, SIM_OFFSET_Y + y * CELL_SIZE, CELL_SIZE, CELL_SIZE))
-                    if self.grid.is_barrier(x, y): pygame.draw.rect(self.screen, COLOR_BARRIER, (SIM_OFFSET_X + x * CELL_SIZE, SIM_OFFSET_Y + y * CELL_SIZE, CELL_SIZE, CELL_SIZE))
-            for agent in self.agents:
-                if not agent.alive: continue
-                rect = (SIM_OFFSET_X + agent.x * CELL_SIZE, SIM_OFFSET_Y + agent.y * CELL_SIZE, CELL_SIZE, CELL_SIZE)
-                # Visual Feedback: Aggressive agents turn redder
-                color = list(agent.color)
-                if agent.kill_intent > 0.5: color = (255, 0, 0)
-                pygame.draw.rect(self.screen, color, rect)
-                if agent == self.selected_agent: pygame.draw.rect(self.screen, COLOR_HIGHLIGHT, rect, 2)
-            pygame.draw.rect(self.screen, (100, 100, 100), sim_rect, 1)
+            self.world_renderer.blit(self.screen, view, world); self.ui_timer.lap("world")
+            self.screen.set_clip(view.rect)
+            if selected and selected.alive:
+                cell = max(view.zoom, 4); sx, sy = view.to_screen(selected.x + 0.5, selected.y + 0.5)
+                pygame.draw.rect(self.screen, COLOR_HIGHLIGHT, (sx - cell / 2, sy - cell / 2, cell, cell), 2)
             if not self.input_mode and self.sim_state == "EDIT" and self.tool_mode != 0 and gx != -1:
-                r, size = self.brush_size - 1, (2*(self.brush_size-1)+1)*CELL_SIZE; overlay = pygame.Surface((size, size), pygame.SRCALPHA); overlay.fill((255, 255, 255, 100)); self.screen.blit(overlay, (SIM_OFFSET_X + (gx - r) * CELL_SIZE, SIM_OFFSET_Y + (gy - r) * CELL_SIZE))
+                r = self.brush_size - 1; size = max(1, round((2*r+1)*view.zoom)); overlay = pygame.Surface((size, size), pygame.SRCALPHA); overlay.fill((255, 255, 255, 100)); self.screen.blit(overlay, view.to_screen(gx - r, gy - r))
+            self.screen.set_clip(None)
+            pygame.draw.rect(self.screen, (100, 100, 100), view.rect, 1)
             pygame.draw.rect(self.screen, (30, 30, 35), (0, SIM_HEIGHT, WINDOW_WIDTH, BOTTOM_BAR_HEIGHT)); pygame.draw.line(self.screen, (100, 100, 100), (0, SIM_HEIGHT), (WINDOW_WIDTH, SIM_HEIGHT))
-            if self.selected_agent:
-                dna = gen.genome_to_hex(self.selected_agent.genome); self.screen.blit(self.font.render("Genome:", True, (150, 150, 150)), (10, SIM_HEIGHT + 15)); self.screen.blit(self.font.render(dna[:120], True, (100, 200, 255)), (80, SIM_HEIGHT + 15))
+            if selected:
+                dna = gen.genome_to_hex(selected.genome); self.screen.blit(self.font.render("Genome:", True, (150, 150, 150)), (10, SIM_HEIGHT + 15)); self.screen.blit(self.font.render(dna[:120], True, (100, 200, 255)), (80, SIM_HEIGHT + 15))
             if self.input_mode:
                 dr = pygame.Rect(WINDOW_WIDTH//2 - 150, WINDOW_HEIGHT//2 - 50, 300, 100); pygame.draw.rect(self.screen, (50, 50, 60), dr); pygame.draw.rect(self.screen, (200, 200, 200), dr, 2)
-                self.screen.blit(self.font.render("Save File:" if self.input_mode == "SAVE" else "Load File:", True, (255, 255, 255)), (dr.x + 10, dr.y + 10)); self.screen.blit(self.font.render(self.input_text + "|", True, (100, 255, 100)), (dr.x + 10, dr.y + 50))
-            pygame.display.flip(); self.clock.tick(60)
+                self.screen.blit(self.font.render({"SAVE": "Save File:", "LOAD": "Load File:", "SIZE": "World Size:"}[self.input_mode], True, (255, 255, 255)), (dr.x + 10, dr.y + 10)); self.screen.blit(self.font.render(self.input_text + "|", True, (100, 255, 100)), (dr.x + 10, dr.y + 50))
+            pygame.display.flip(); self.ui_timer.lap("flip")
+            self.runner.frame(self.clock.get_fps()); self.clock.tick(60)
+        self.runner.stop()
         pygame.quit()
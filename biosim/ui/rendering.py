@@ -1,113 +1,268 @@
 import math
+import numpy as np
 import pygame
 from biosim.core.constants import *
-from biosim.core.genome import genome_to_hex
+from biosim.core.genome import unpack_genome
 
-def draw_brain(screen, agent, rect, font, mouse_pos=None, hide_dead=False):
+def block_any(mask, k):
+    """Downsamples a bool mask by k x k blocks (True if any cell is); edges are padded."""
+    if k == 1: return mask
+    w, h = mask.shape
+    mask = np.pad(mask, ((0, -w % k), (0, -h % k)))
+    return mask.reshape(mask.shape[0] // k, k, mask.shape[1] // k, k).any(axis=(1, 3))
+
+class WorldRenderer:
+    """
+    Draws the part of the world inside a Viewport. NumPy RGB layers are
+    composed for the visible cells only (pheromones, then barriers/safe zones,
+    then agents) and scaled onto the screen in one blit, so the cost follows
+    the window, not the world. Zoomed out past one cell per pixel, each pixel
+    covers a k x k block: walls and zones show if any cell of the block has
+    them, pheromones are sampled and agents binned. The barrier/safe-zone layer
+    is cached until the grid reports a static change or the window moves.
+    compose() reads the simulation (under the runner's lock), blit() only
+    its own snapshot.
+    """
+    RED = np.array([255, 0, 0], dtype=np.uint8)
+
+    def __init__(self, safe_color, barrier_color):
+        self.safe_color, self.barrier_color = safe_color, barrier_color
+        self.static_key = self.surface = None
+        self.agents = self.colors = None
+
+    def static_layer(self, grid, window, k):
+        """(rgb, mask) of barriers and safe zones in the window, cached per grid version and window."""
+        key = (grid, grid.static_version, window, k)
+        if key != self.static_key:
+            x0, x1, y0, y1 = window
+            barrier = block_any(grid.data[x0:x1, y0:y1] == BARRIER, k)
+            safe = block_any(grid.safe_zones[x0:x1, y0:y1], k)
+            rgb = np.zeros(barrier.shape + (3,), dtype=np.uint8)
+            rgb[safe] = self.safe_color
+            rgb[barrier] = self.barrier_color
+            self.static_rgb, self.static_mask = rgb, (safe | barrier)[:, :, None]
+            self.static_key = key
+        return self.static_rgb, self.static_mask
+
+    def agent_colors(self, sim):
+        # Colors only change with the population
+        if sim.agents is not self.agents:
+            self.agents = sim.agents
+            self.colors = np.array([a.color for a in sim.agents], dtype=np.uint8).reshape(-1, 3)
+        return self.colors
+
+    def compose(self, sim, view):
+        """
+        The visible window as a new RGB array, plus its origin cell and block
+        size: a snapshot of the state, so it can be blitted without the lock.
+        None when nothing is visible.
+        """
+        grid = sim.grid
+        window, k = view.visible(), view.step()
+        x0, x1, y0, y1 = window
+        if x0 >= x1 or y0 >= y1: return None
+        static_rgb, static_mask = self.static_layer(grid, window, k)
+        frame = np.zeros_like(static_rgb)
+        ph = (grid.pheromones[x0:x1:k, y0:y1:k] * 255).astype(np.uint8)
+        frame[:, :, 2] = np.where(ph > 10, ph, 0)
+        frame = np.where(static_mask, static_rgb, frame)
+
+        if sim.agents:
+            if k == 1:
+                # Only the visible cells are read; dead agents are off the grid
+                cells = grid.data[x0:x1, y0:y1]
+                lx, ly = np.nonzero(cells > 0)
+                rows = sim.slots[cells[lx, ly]]
+            else:
+                xs, ys = sim.positions()[:2]
+                rows = np.flatnonzero((sim.slots[sim.ids] >= 0) & (xs >= x0) & (xs < x1) & (ys >= y0) & (ys < y1))
+                lx, ly = (xs[rows] - x0) // k, (ys[rows] - y0) // k
+            # Visual Feedback: Aggressive agents turn red
+            frame[lx, ly] = np.where((sim.kill_intent[rows] > 0.5)[:, None], self.RED, self.agent_colors(sim)[rows])
+        return frame, (x0, y0), k
+
+    def blit(self, screen, view, snapshot):
+        """Scales a compose() snapshot onto the viewport."""
+        if snapshot is None: return
+        frame, (x0, y0), k = snapshot
+        if self.surface is None or self.surface.get_size() != frame.shape[:2]: self.surface = pygame.Surface(frame.shape[:2])
+        pygame.surfarray.blit_array(self.surface, frame)
+        sx, sy = view.to_screen(x0, y0)
+        # A padded edge block covers k cells too
+        size = (round(frame.shape[0] * k * view.zoom), round(frame.shape[1] * k * view.zoom))
+        clip = screen.get_clip()
+        screen.set_clip(view.rect)
+        screen.blit(pygame.transform.scale(self.surface, size), (round(sx), round(sy)))
+        screen.set_clip(clip)
+
+class BrainView:
+    """
+    Neural viewer for the selected agent. Layout, connections and labels
+    only depend on the genome, so they are drawn once per genome into cached
+    surfaces (the plain view, plus one per hovered node on first hover).
+    Each frame blits one of them and draws the neuron activations on top.
+    """
+    NODE_RADIUS = 6
+
+    def __init__(self):
+        self.key = None
+        self.surfaces = {}
+
+    def layout(self, agent, w, h, hide_dead):
+        """Node positions (local to the panel) and connections from the genome."""
+        input_x, output_x, hidden_x = 50, w - 50, w // 2
+        y_spacing = h / (max(NUM_SENSORS, NUM_ACTIONS) + 1)
+        genes = unpack_genome(agent.genome)
+
+        # 1. Identify Connected Nodes
+        edges = []
+        connected_neurons, used_sensors, used_actions = set(), set(), set()
+        for g in genes:
+            src_id = g.source_num % (NUM_SENSORS if g.source_type==1 else MAX_NEURONS)
+            snk_id = g.sink_num % (NUM_ACTIONS if g.sink_type==1 else MAX_NEURONS)
+            if g.source_type == 1: used_sensors.add(src_id)
+            else: connected_neurons.add(src_id)
+            if g.sink_type == 1: used_actions.add(snk_id)
+            else: connected_neurons.add(snk_id)
+            edges.append((('S' if g.source_type == 1 else 'N', src_id), ('A' if g.sink_type == 1 else 'N', snk_id), g.weight))
+
+        # 2. Calculate Positions (sensors, actions, hidden ring)
+        nodes = {}
+        for i in range(NUM_SENSORS):
+            if not hide_dead or i in used_sensors: nodes[('S', i)] = (input_x, (i + 1) * y_spacing)
+        for i in range(NUM_ACTIONS):
+            if not hide_dead or i in used_actions: nodes[('A', i)] = (output_x, (i + 1) * y_spacing)
+        radius = min(w, h) / 4
+        for i in range(MAX_NEURONS):
+            if hide_dead and i not in connected_neurons: continue
+            angle = (2 * math.pi * i) / MAX_NEURONS
+            nodes[('N', i)] = (hidden_x + math.cos(angle) * radius, h // 2 + math.sin(angle) * radius)
+        edges = [e for e in edges if e[0] in nodes and e[1] in nodes]
+        return nodes, edges
+
+    def static_surface(self, hovered, font, size):
+        """Background, connections and sensor/action nodes for one hover state."""
+        if hovered in self.surfaces: return self.surfaces[hovered]
+        surf = pygame.Surface(size)
+        surf.fill((30, 30, 40))
+        pygame.draw.rect(surf, (100, 100, 100), surf.get_rect(), 1)
+        nodes, r = self.nodes, self.NODE_RADIUS
+
+        # 3. Draw Connections
+        for start_key, end_key, weight in self.edges:
+            if hovered is None or hovered == start_key or hovered == end_key:
+                width = max(2, int(abs(weight)) + (2 if hovered else 0))
+                color = (50, 200, 255) if weight > 0 else (255, 50, 50)
+            else:
+                width = 1
+                color = (40, 40, 60)
+            pygame.draw.line(surf, color, nodes[start_key], nodes[end_key], width)
+
+        # 4. Draw Nodes (hidden neurons are drawn live, see draw)
+        for key, pos in nodes.items():
+            type, idx = key
+            is_hover = hovered == key
+            if type == 'S':
+                col = (100, 255, 100) if is_hover else (0, 200, 0)
+                pygame.draw.circle(surf, col, pos, r + (2 if is_hover else 0))
+                name = SENSOR_NAMES.get(idx, str(idx))
+                lbl = font.render(name, True, (150, 255, 150) if (hovered is None or is_hover) else (60, 100, 60))
+                surf.blit(lbl, lbl.get_rect(midright=(pos[0]-10, pos[1])))
+            elif type == 'A':
+                col = (255, 100, 100) if is_hover else (200, 0, 0)
+                pygame.draw.circle(surf, col, pos, r + (2 if is_hover else 0))
+                name = ACTION_NAMES.get(idx, str(idx))
+                lbl = font.render(name, True, (255, 150, 150) if (hovered is None or is_hover) else (100, 60, 60))
+                surf.blit(lbl, lbl.get_rect(midleft=(pos[0]+10, pos[1])))
+        self.surfaces[hovered] = surf
+        return surf
+
+    def draw(self, screen, agent, rect, font, mouse_pos=None, hide_dead=False):
+        key = (agent.genome.tobytes() if agent is not None else None, rect.size, hide_dead, font)
+        if key != self.key:
+            self.key, self.surfaces = key, {}
+            if agent is not None:
+                self.nodes, self.edges = self.layout(agent, rect.width, rect.height, hide_dead)
+                self.node_keys = list(self.nodes)
+                self.node_xy = np.array(list(self.nodes.values()), dtype=np.float64).reshape(-1, 2)
+
+        if agent is None:
+            if None not in self.surfaces:
+                surf = pygame.Surface(rect.size)
+                surf.fill((30, 30, 40))
+                pygame.draw.rect(surf, (100, 100, 100), surf.get_rect(), 1)
+                text = font.render("Select an Agent", True, (100, 100, 100))
+                surf.blit(text, text.get_rect(center=surf.get_rect().center))
+                self.surfaces[None] = surf
+            screen.blit(self.surfaces[None], rect)
+            return
+
+        # Hover: the last node within reach (sensors, then actions, then neurons)
+        hovered = None
+        if mouse_pos:
+            d = np.hypot(self.node_xy[:, 0] + rect.left - mouse_pos[0], self.node_xy[:, 1] + rect.top - mouse_pos[1])
+            near = np.flatnonzero(d < self.NODE_RADIUS + 5)
+            if len(near): hovered = self.node_keys[near[-1]]
+        screen.blit(self.static_surface(hovered, font, rect.size), rect)
+
+        # Live part: neuron activations
+        for key, pos in self.nodes.items():
+            if key[0] != 'N': continue
+            is_hover = hovered == key
+            pos = (rect.left + pos[0], rect.top + pos[1])
+            c_val = int((agent.neurons[key[1]] + 1) * 127)
+            pygame.draw.circle(screen, (c_val, c_val, c_val), pos, self.NODE_RADIUS + (2 if is_hover else 0))
+            pygame.draw.circle(screen, (255, 255, 255) if is_hover else (100, 100, 100), pos, self.NODE_RADIUS + (2 if is_hover else 0), 1)
+
+def draw_profile(screen, rect, font, sections):
+    """
+    Per-phase timing table. sections: [(title, [(phase, seconds, calls)])];
+    each phase shows ms per call and its share of the section's time.
+    """
     pygame.draw.rect(screen, (30, 30, 40), rect)
     pygame.draw.rect(screen, (100, 100, 100), rect, 1)
-    
-    if agent is None:
-        text = font.render("Select an Agent", True, (100, 100, 100))
+    if not sections:
+        text = font.render("Profiling...", True, (100, 100, 100))
         screen.blit(text, text.get_rect(center=rect.center))
         return
+    y = rect.top + 8
+    for title, rows in sections:
+        screen.blit(font.render(title, True, (150, 255, 150)), (rect.left + 8, y)); y += 14
+        total = sum(seconds for _, seconds, _ in rows) or 1.0
+        for phase, seconds, calls in rows:
+            share = seconds / total
+            pygame.draw.rect(screen, (50, 70, 110), (rect.left + 8, y + 1, int((rect.width - 16) * share), 10))
+            screen.blit(font.render(f"{phase:<11}{seconds * 1000 / calls:8.3f} ms {share:6.1%}", True, (220, 220, 220)), (rect.left + 12, y))
+            y += 13
+        y += 8
 
-    node_radius = 6
-    input_x = rect.left + 50  
-    output_x = rect.right - 50
-    hidden_x = rect.centerx
-    y_spacing = rect.height / (max(NUM_SENSORS, NUM_ACTIONS) + 1)
-    
-    node_positions = {}
-    hovered_node = None
-    
-    # 1. Identify Connected Nodes
-    connected_neurons = set()
-    used_sensors = set()
-    used_actions = set()
-    
-    for g in agent.genome:
-        src_id = g.source_num % (NUM_SENSORS if g.source_type==1 else MAX_NEURONS)
-        snk_id = g.sink_num % (NUM_ACTIONS if g.sink_type==1 else MAX_NEURONS)
-        
-        if g.source_type == 1: used_sensors.add(src_id)
-        else: connected_neurons.add(src_id)
-            
-        if g.sink_type == 1: used_actions.add(snk_id)
-        else: connected_neurons.add(snk_id)
-
-    # 2. Calculate Positions
-    # Sensors
-    for i in range(NUM_SENSORS):
-        if hide_dead and i not in used_sensors: continue
-        y = rect.top + (i + 1) * y_spacing
-        pos = (input_x, y)
-        node_positions[('S', i)] = pos
-        if mouse_pos and math.hypot(mouse_pos[0]-pos[0], mouse_pos[1]-pos[1]) < node_radius + 5:
-            hovered_node = ('S', i)
-
-    # Actions
-    for i in range(NUM_ACTIONS):
-        if hide_dead and i not in used_actions: continue
-        y = rect.top + (i + 1) * y_spacing
-        pos = (output_x, y)
-        node_positions[('A', i)] = pos
-        if mouse_pos and math.hypot(mouse_pos[0]-pos[0], mouse_pos[1]-pos[1]) < node_radius + 5:
-            hovered_node = ('A', i)
-
-    # Hidden
-    center_y = rect.centery
-    radius = min(rect.width, rect.height) / 4
-    for i in range(MAX_NEURONS):
-        if hide_dead and i not in connected_neurons: continue
-        angle = (2 * math.pi * i) / MAX_NEURONS
-        nx = hidden_x + math.cos(angle) * radius
-        ny = center_y + math.sin(angle) * radius
-        pos = (nx, ny)
-        node_positions[('N', i)] = pos
-        if mouse_pos and math.hypot(mouse_pos[0]-pos[0], mouse_pos[1]-pos[1]) < node_radius + 5:
-            hovered_node = ('N', i)
-
-    # 3. Draw Connections
-    for g in agent.genome:
-        start_key = ('S' if g.source_type == 1 else 'N', g.source_num % (NUM_SENSORS if g.source_type==1 else MAX_NEURONS))
-        end_key = ('A' if g.sink_type == 1 else 'N', g.sink_num % (NUM_ACTIONS if g.sink_type==1 else MAX_NEURONS))
-        
-        if start_key in node_positions and end_key in node_positions:
-            start_pos = node_positions[start_key]
-            end_pos = node_positions[end_key]
-            
-            is_highlighted = (hovered_node is None) or (hovered_node == start_key) or (hovered_node == end_key)
-            
-            if is_highlighted:
-                width = max(2, int(abs(g.weight)) + (2 if hovered_node else 0))
-                color = (50, 200, 255) if g.weight > 0 else (255, 50, 50)
-            else:
-                width = 1
-                color = (40, 40, 60)
-            
-            pygame.draw.line(screen, color, start_pos, end_pos, width)
-
-    # 4. Draw Nodes
-    for key, pos in node_positions.items():
-        type, idx = key
-        is_hover = hovered_node == key
-        
-        if type == 'S':
-            col = (100, 255, 100) if is_hover else (0, 200, 0)
-            pygame.draw.circle(screen, col, pos, node_radius + (2 if is_hover else 0))
-            name = SENSOR_NAMES.get(idx, str(idx))
-            lbl = font.render(name, True, (150, 255, 150) if (hovered_node is None or is_hover) else (60, 100, 60))
-            screen.blit(lbl, lbl.get_rect(midright=(pos[0]-10, pos[1])))
-            
-        elif type == 'A':
-            col = (255, 100, 100) if is_hover else (200, 0, 0)
-            pygame.draw.circle(screen, col, pos, node_radius + (2 if is_hover else 0))
-            name = ACTION_NAMES.get(idx, str(idx))
-            lbl = font.render(name, True, (255, 150, 150) if (hovered_node is None or is_hover) else (100, 60, 60))
-            screen.blit(lbl, lbl.get_rect(midleft=(pos[0]+10, pos[1])))
-            
-        elif type == 'N':
-            c_val = int((agent.neurons[idx] + 1) * 127)
-            pygame.draw.circle(screen, (c_val, c_val, c_val), pos, node_radius + (2 if is_hover else 0))
-            pygame.draw.circle(screen, (255, 255, 255) if is_hover else (100, 100, 100), pos, node_radius + (2 if is_hover else 0), 1)
\ No newline at end of file
+def draw_stats(screen, rect, font, rows):
+    """
+    Population graph over the last generations (rows from GenerationStats):
+    survival rate in green and kills per agent in red, scaled to the larger
+    of the two; at most one generation per pixel column.
+    """
+    pygame.draw.rect(screen, (30, 30, 40), rect)
+    pygame.draw.rect(screen, (100, 100, 100), rect, 1)
+    hint = font.render("Select an Agent to see its brain", True, (100, 100, 100))
+    screen.blit(hint, hint.get_rect(midbottom=(rect.centerx, rect.bottom - 6)))
+    if len(rows) == 0:
+        text = font.render("Population graph after the first generation", True, (100, 100, 100))
+        screen.blit(text, text.get_rect(center=rect.center))
+        return
+    last = rows[-1]
+    screen.blit(font.render(f"Gen {last['generation']}: {last['survivors']} survivors ({last['rate']:.1%})", True, (100, 220, 100)), (rect.left + 8, rect.top + 8))
+    screen.blit(font.render(f"Kills {last['kills']}", True, (220, 80, 80)), (rect.left + 8, rect.top + 22))
+    screen.blit(font.render(f"Genome {last['genome_len']:.1f}  Pheromone {last['pheromone']:.0f}", True, (220, 220, 220)), (rect.left + 80, rect.top + 22))
+
+    plot = pygame.Rect(rect.left + 8, rect.top + 40, rect.width - 16, rect.height - 64)
+    pygame.draw.rect(screen, (50, 50, 60), plot, 1)
+    rows = rows[-plot.width:]
+    series = ((rows["rate"], (100, 220, 100)), (rows["kills"] / np.maximum(rows["population"], 1), (220, 80, 80)))
+    top = max(max(float(values.max()) for values, _ in series), 0.01)
+    screen.blit(font.render(f"{top:.1%}", True, (150, 150, 150)), (plot.left + 3, plot.top + 2))
+    xs = plot.left + np.arange(len(rows)) * (plot.width - 1) / max(len(rows) - 1, 1)
+    for values, color in series:
+        ys = plot.bottom - 1 - values / top * (plot.height - 2)
+        if len(rows) > 1: pygame.draw.lines(screen, color, False, np.stack([xs, ys], axis=1).tolist())
+        else: pygame.draw.circle(screen, color, (float(xs[0]), float(ys[0])), 2)
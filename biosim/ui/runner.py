@@ -0,0 +1,69 @@
+import threading
+import time
+
+class SimulationRunner:
+    """
+    Steps a Simulation on a worker thread, decoupled from the frame rate.
+    The UI holds `lock` while it handles input and takes a snapshot of the
+    frame, so it always sees (and edits) the state between two whole steps;
+    drawing happens after it lets go.
+    Modes:
+      "sync"     - steps_per_frame (1) steps per rendered frame, as before
+      "adaptive" - steps_per_frame tuned each frame to hold target_fps
+      "turbo"    - steps continuously; frames show whatever is current
+    """
+    MODES = ("sync", "adaptive", "turbo")
+
+    def __init__(self, sim, target_fps=60):
+        self.sim = sim
+        self.lock = threading.RLock()
+        self.mode = "sync"
+        self.active = False # set by the UI: running and not paused
+        self.target_fps = target_fps
+        self.steps_per_frame = 1
+        self.budget = 0 # steps left for the current frame (sync/adaptive)
+        self.steps_per_sec = 0.0
+        self.steps_done, self.rate_mark = 0, (0, time.perf_counter())
+        self.wake = threading.Event()
+        self.stopped = False
+        self.thread = threading.Thread(target=self.work, daemon=True)
+        self.thread.start()
+
+    def cycle_mode(self):
+        self.mode = self.MODES[(self.MODES.index(self.mode) + 1) % len(self.MODES)]
+        self.steps_per_frame = 1
+
+    def work(self):
+        while not self.stopped:
+            if not self.active or (self.mode != "turbo" and self.budget <= 0):
+                self.wake.wait(0.05); self.wake.clear()
+                continue
+            with self.lock:
+                # The UI may have paused or edited while we waited
+                if self.active: self.sim.step(); self.steps_done += 1
+                self.budget -= 1
+            # Let the UI thread in between steps
+            time.sleep(0)
+
+    def frame(self, fps):
+        """Called by the UI once per rendered frame, without holding the lock."""
+        if self.mode == "adaptive":
+            # Back off if the last frame's steps did not finish or frames are
+            # slow; otherwise grow gradually
+            if self.budget > 0 or (0 < fps < self.target_fps * 0.9):
+                self.steps_per_frame = max(1, int(self.steps_per_frame * 0.8))
+            else:
+                self.steps_per_frame += 1 + self.steps_per_frame // 10
+        self.budget = self.steps_per_frame
+        self.wake.set()
+
+        count, start = self.rate_mark
+        now = time.perf_counter()
+        if now - start >= 0.5:
+            self.steps_per_sec = (self.steps_done - count) / (now - start)
+            self.rate_mark = (self.steps_done, now)
+
+    def stop(self):
+        self.stopped = True
+        self.wake.set()
+        self.thread.join()
@@ -0,0 +1,68 @@
+import math
+
+class Viewport:
+    """
+    Maps a window of the world onto a screen rect. `zoom` is screen pixels
+    per cell and (ox, oy) the world position of the rect's top-left corner,
+    both fractional. Zooming out stops once the whole world fits.
+    """
+    MAX_ZOOM = 32.0
+
+    def __init__(self, rect, world_size):
+        self.rect = rect
+        self.reset(world_size)
+
+    def reset(self, world_size):
+        """Shows the whole of a (new) world."""
+        self.world = world_size
+        # Whole pixels per cell when the world fits, so cells stay even
+        fit = min(self.rect.w, self.rect.h) / world_size
+        self.fit_zoom = math.floor(fit) if fit >= 1 else fit
+        self.zoom = self.fit_zoom
+        self.ox = self.oy = 0.0
+        self.clamp()
+
+    def clamp(self):
+        # Keep the world on screen; center it along an axis where it is smaller than the rect
+        self.zoom = min(max(self.zoom, self.fit_zoom), max(self.MAX_ZOOM, self.fit_zoom))
+        span_x, span_y = self.rect.w / self.zoom, self.rect.h / self.zoom
+        self.ox = (self.world - span_x) / 2 if span_x >= self.world else min(max(self.ox, 0.0), self.world - span_x)
+        self.oy = (self.world - span_y) / 2 if span_y >= self.world else min(max(self.oy, 0.0), self.world - span_y)
+
+    def zoom_at(self, sx, sy, factor):
+        """Zooms by factor, keeping the world point under screen (sx, sy) in place."""
+        wx, wy = self.to_world(sx, sy)
+        self.zoom *= factor
+        self.clamp()
+        self.ox, self.oy = wx - (sx - self.rect.x) / self.zoom, wy - (sy - self.rect.y) / self.zoom
+        self.clamp()
+
+    def pan(self, dx, dy):
+        """Moves the view by a screen-pixel drag."""
+        self.ox -= dx / self.zoom; self.oy -= dy / self.zoom
+        self.clamp()
+
+    def to_world(self, sx, sy):
+        return self.ox + (sx - self.rect.x) / self.zoom, self.oy + (sy - self.rect.y) / self.zoom
+
+    def to_cell(self, sx, sy):
+        """Cell under a screen point, or None outside the rect or the world."""
+        if not self.rect.collidepoint(sx, sy): return None
+        wx, wy = self.to_world(sx, sy)
+        gx, gy = math.floor(wx), math.floor(wy)
+        return (gx, gy) if 0 <= gx < self.world and 0 <= gy < self.world else None
+
+    def to_screen(self, gx, gy):
+        """Screen position of a cell's top-left corner."""
+        return self.rect.x + (gx - self.ox) * self.zoom, self.rect.y + (gy - self.oy) * self.zoom
+
+    def visible(self):
+        """Cell window (x0, x1, y0, y1) intersecting the rect, clipped to the world."""
+        x0, y0 = max(0, math.floor(self.ox)), max(0, math.floor(self.oy))
+        x1 = min(self.world, math.ceil(self.ox + self.rect.w / self.zoom))
+        y1 = min(self.world, math.ceil(self.oy + self.rect.h / self.zoom))
+        return x0, x1, y0, y1
+
+    def step(self):
+        """Cells per rendered pixel when zoomed out (1 once cells are at least a pixel)."""
+        return max(1, math.ceil(1 / self.zoom))